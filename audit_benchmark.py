@@ -0,0 +1,311 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import audit_engine
+from export_reader import iter_export_chunks
+from llm_backends import LLM_BACKENDS
+from report_writer import ReportWriter
+from rule_prefilter import load_rules
+from service_catalog import ServiceCatalog
+from stub_llm_server import canned_answer
+
+# Offline throughput benchmark for the audit pipeline. Synthetic exports shaped like
+# Current_day_by_Technician.xlsx are audited end to end (streaming read, rules, LLM checks, Q-2
+# embeddings, report write) against an in-process stub chat model with configurable latency and
+# deterministic canned answers, and hashed bag-of-words embeddings instead of MiniLM. No network and
+# no GPU are needed, so concurrency, caching and batching changes can be compared run against run:
+#
+#   python audit_benchmark.py                                  # 100, 1k and 10k tickets
+#   python audit_benchmark.py --sizes 1000 --max-concurrency 16 --latency-ms 300
+#   python audit_benchmark.py --sizes 1000 --llm-cache --repeat 2   # cold vs. warm cache
+#   python audit_benchmark.py --json bench.json                # keep the results for comparison
+#
+# Each size runs in its own child process so the peak RSS reported is that run's alone.
+
+SERVICES = {
+    "PASSWORD": ["password reset request", "account locked after failed logins", "password expired"],
+    "MS OUTLOOK": ["mailbox not syncing", "cannot open shared calendar", "Security Awareness Module link not working"],
+    "VPN": ["cannot connect from home", "VPN drops every few minutes"],
+    "PRINTER": ["printer offline", "print jobs stuck in queue"],
+    "CCH TAX": ["Could not compute", "license activation failed"],
+    "QUICKBOOKS": ["application gets stuck when opening company file", "update fails to install"],
+    "USER ADMIN": ["PASSWORD RESET ISSUE", "new joiner account setup", "access to shared drive"],
+    "TEAMS": ["no audio in meetings", "cannot share screen"],
+    "ONEDRIVE": ["files not syncing", "storage full warning"],
+    "LAPTOP": ["running very slow", "battery not charging", "blue screen on startup"],
+}
+TECHNICIANS = ["Narayanan, T. Surya", "Kumar, Sathish T.", "S, Subash", "Radakrishnan, Iyappan",
+               "Acharya, Spandan", "Sathiyamoorthi, V"]
+USERS = ["Smith, John", "Doe, Jane", "Patel, Ravi", "Garcia, Maria", "Chen, Wei", "Brown, Lisa", "Khan, Amir"]
+RESOLUTIONS = [
+    "As per KBA - {kba}, reset the settings and restarted the application. User confirmed the issue is resolved.",
+    "Followed the solution article steps to clear the cache and re-sign in. User confirmed.",
+    "Issue was auto resolved after the overnight update.",
+    "Created new KBA - {kba} documenting the fix for this {issue} issue.",
+    "Restarted the machine and the issue went away.",
+    "Reinstalled the application from the software center; the {issue} problem no longer occurs.",
+    "Guided the user over the phone, changed the configuration and tested with the user. User has confirmed.",
+    "Escalated to the vendor, applied their patch.",
+]
+OTHER_COLUMNS = ["Requester Job Title", "Category", "Sub Category", "Priority", "Request Status", "Site"]
+
+
+def synthetic_export(rows, seed=7):
+    # Tickets shaped like the Current_day_by_Technician export; recurring services and phrasings make
+    # subjects, generated headers and resolutions repeat the way real exports do
+    rng = random.Random(seed)
+    records = []
+    for i in range(rows):
+        service = rng.choice(list(SERVICES))
+        issue = rng.choice(SERVICES[service])
+        requester = rng.choice(USERS)
+        if rng.random() < 0.6:
+            subject = f"{service} - {issue}"
+        else:
+            subject = rng.choice([issue, f"{service.lower()} {issue}", f"Issue with {service.title()}"])
+        on_behalf = rng.choices(["Not Assigned", requester, rng.choice(USERS), None], [6, 2, 1, 1])[0]
+        records.append({
+            "RequestID": f"INC-{200000 + i}",
+            "Requester": requester,
+            "Requester Job Title": rng.choice(["Analyst", "Manager", "Associate"]),
+            "Request Mode": rng.choice(["Phone", "Service Portal", "E-Mail", "Chat"]),
+            "Category": service.title(),
+            "Sub Category": "General",
+            "Subject": subject,
+            "Priority": rng.choice(["Low", "Medium", "High"]),
+            "Request Status": "Resolved",
+            "Resolved Time": f"{rng.randint(1, 28):02d}-04-2025 {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+            "Technician": rng.choice(TECHNICIANS),
+            "Resolution": rng.choice(RESOLUTIONS).format(kba=rng.randint(50, 140), issue=issue.lower()),
+            "Site": rng.choice(["Chennai", "Bangalore", "Remote"]),
+            "On Behalf Of User": on_behalf,
+            "Issue Description": f"User reports {issue.lower()} on {service.lower()}. " + rng.choice(
+                ["Needs it fixed today.", "Started after the last update.", "Affects only this user.", ""]),
+        })
+    return pd.DataFrame.from_records(records)
+
+
+def ensure_export(rows, data_dir, seed):
+    # Synthetic exports are written once and reused across benchmark runs
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"synthetic_export_{rows}_{seed}.xlsx")
+    if not os.path.exists(path):
+        with ReportWriter(path) as writer:
+            writer.write(synthetic_export(rows, seed))
+    return path
+
+
+class StubResponse:
+    def __init__(self, content, prompt_tokens, completion_tokens):
+        self.content = content
+        self.response_metadata = {"token_usage": {
+            "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }}
+
+
+class StubChat:
+    # Stands in for ChatGroq: sleeps for the configured latency (±25%) and answers like stub_llm_server
+    backend = "stub"
+    model_name = "stub"
+    temperature = 0
+
+    def __init__(self, latency_ms=50.0, seed=7):
+        self.latency_ms = latency_ms
+        self._rng = random.Random(seed)
+
+    def invoke(self, messages):
+        prompt = "".join(message if isinstance(message, str) else message.content for message in messages)
+        time.sleep(max(0.0, self._rng.gauss(self.latency_ms, self.latency_ms * 0.25)) / 1000.0)
+        answer = canned_answer(prompt)
+        return StubResponse(answer, len(prompt) // 4, len(answer) // 4 + 1)
+
+
+class StubEmbedder:
+    # Stands in for the SentenceTransformer: hashed bag-of-words vectors, normalized like MiniLM's
+    def __init__(self, dimensions=384):
+        self.dimensions = dimensions
+
+    def encode(self, texts, batch_size=32, convert_to_tensor=False, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else texts
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in str(text).lower().split():
+                vectors[row, int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % self.dimensions] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1.0, norms)
+        vectors = vectors[0] if single else vectors
+        if convert_to_tensor:
+            import torch
+
+            return torch.from_numpy(vectors)
+        return vectors
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_size(config):
+    # One benchmark size, run in this process; returns one result per repeat
+    export_path = ensure_export(config["rows"], config["data_dir"], config["seed"])
+    if config["llm_backend"] == "stub":
+        chat = StubChat(config["latency_ms"], config["seed"])
+    else:
+        # A real backend (e.g. a llama.cpp server on this machine) instead of the stub
+        chat = audit_engine.load_chat_model(config["llm_backend"], config["llm_model"])
+    if config["requests_per_minute"]:
+        from llm_client import RateLimitedChat
+
+        chat = RateLimitedChat(chat, requests_per_minute=config["requests_per_minute"], tokens_per_minute=10 ** 9)
+    semantic_model = audit_engine.load_semantic_model() if config["real_embeddings"] else StubEmbedder()
+    rules = load_rules(audit_engine.PREFILTER_RULES_PATH) if config["rules"] else []
+    service_catalog = None
+    if config["service_catalog"]:
+        # Catalog of the synthetic services, with one left out so its tickets get flagged
+        service_catalog = ServiceCatalog(list(SERVICES)[:-1])
+    template_df = pd.read_excel(audit_engine.DEFAULT_TEMPLATE_PATH)
+    # score_subjects imports this lazily; importing it here keeps torch's start-up out of the timings
+    from sentence_transformers import util  # noqa: F401
+
+    work_dir = tempfile.mkdtemp(prefix="audit_benchmark_")
+    try:
+        # Caches live in a scratch directory, so each size starts cold and --repeat shows the warm runs
+        llm_cache = audit_engine.open_llm_cache(work_dir) if config["llm_cache"] else None
+        ledger = audit_engine.open_ledger(work_dir) if config["ledger"] else None
+        embedding_cache = None
+        if config["embedding_cache"]:
+            model_name = audit_engine.SEMANTIC_MODEL_NAME if config["real_embeddings"] else "stub-hashed-words"
+            embedding_cache = audit_engine.open_embedding_cache(work_dir, model_name)
+        results = []
+        for repeat in range(config["repeat"]):
+            ctx = audit_engine.AuditContext(
+                chat, semantic_model, llm_cache,
+                max_workers=config["max_concurrency"], resolution_mode=config["resolution_mode"], rules=rules,
+                ledger=ledger, embedding_cache=embedding_cache, subject_mode=config["subject_mode"],
+                service_catalog=service_catalog, coalesce=config["coalesce"],
+                resolution_clustering=config["cluster_resolutions"], prompt_compaction=config["compaction"],
+            )
+            with ReportWriter(os.path.join(work_dir, "report.xlsx")) as writer:
+                for report_chunk in audit_engine.iter_audit(
+                        ctx, iter_export_chunks(export_path, config["chunk_size"]), template_df):
+                    with ctx.metrics.stage("excel_write"):
+                        writer.write(report_chunk)
+            summary = ctx.summary()
+            results.append({
+                "rows": config["rows"],
+                "repeat": repeat + 1,
+                "wall_seconds": summary["wall_seconds"],
+                "tickets_per_second": round(summary["tickets"] / summary["wall_seconds"], 1),
+                "peak_rss_mb": peak_rss_mb(),
+                **{key: summary[key] for key in ("tickets", "llm_backend", "stages", "llm", "questions", "embeddings",
+                                                 "subject_mode", "subject_agreement", "cluster_agreement", "coalescing",
+                                                 "stats")},
+            })
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def print_table(results):
+    stage_names = ["excel_load", "rules", "clustering", "llm_checks", "embedding", "excel_write"]
+    header = ["rows", "run", "wall s", "tickets/s", "peak MB", "LLM calls", "shared", "p50 s", "p95 s", "emb hit"] + stage_names
+    lines = [header]
+    for result in results:
+        llm = result["llm"]
+        lines.append([
+            result["rows"], result["repeat"], f"{result['wall_seconds']:.2f}", f"{result['tickets_per_second']:.1f}",
+            result["peak_rss_mb"] if result["peak_rss_mb"] is not None else "n/a", llm["calls"],
+            result["stats"]["llm_calls_coalesced"],
+            "-" if llm["latency_p50"] is None else f"{llm['latency_p50']:.3f}",
+            "-" if llm["latency_p95"] is None else f"{llm['latency_p95']:.3f}",
+            "-" if result["embeddings"]["hit_rate"] is None else f"{result['embeddings']['hit_rate']:.0%}",
+        ] + [f"{result['stages'].get(name, 0.0):.2f}" for name in stage_names])
+    widths = [max(len(str(line[i])) for line in lines) for i in range(len(header))]
+    for line in lines:
+        print("  ".join(str(value).rjust(width) for value, width in zip(line, widths)))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the audit pipeline offline with a stub LLM.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="tickets per synthetic export")
+    parser.add_argument("--llm-backend", choices=["stub"] + LLM_BACKENDS, default="stub",
+                        help="chat backend; everything but the stub needs that backend to be available (default: %(default)s)")
+    parser.add_argument("--llm-model", help="model name for a real backend")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="mean stub LLM latency (default: %(default)s)")
+    parser.add_argument("--requests-per-minute", type=int, default=0,
+                        help="throttle the stub through RateLimitedChat at this rate (default: unthrottled)")
+    parser.add_argument("--max-concurrency", type=int, default=audit_engine.LLM_MAX_CONCURRENCY)
+    parser.add_argument("--resolution-mode", choices=["combined", "separate"], default=audit_engine.RESOLUTION_EVAL_MODE)
+    parser.add_argument("--subject-mode", choices=audit_engine.SUBJECT_CHECK_MODES, default=audit_engine.SUBJECT_CHECK_MODE)
+    parser.add_argument("--service-catalog", action="store_true", help="check subject prefixes against a service catalog")
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--no-rules", dest="rules", action="store_false", help="disable the rule fast path")
+    parser.add_argument("--no-coalesce", dest="coalesce", action="store_false",
+                        help="call the LLM for every ticket, even for inputs already sent in the run")
+    parser.add_argument("--no-compaction", dest="compaction", action="store_false",
+                        help="send resolutions and issue descriptions to the model verbatim")
+    parser.add_argument("--cluster-resolutions", action="store_true", help="cluster paraphrased resolutions")
+    parser.add_argument("--llm-cache", action="store_true", help="use a (fresh) LLM response cache")
+    parser.add_argument("--ledger", action="store_true", help="use a (fresh) audit ledger")
+    parser.add_argument("--embedding-cache", action="store_true", help="use a (fresh) Q-2 embedding cache")
+    parser.add_argument("--repeat", type=int, default=1, help="audit each export this many times, sharing caches")
+    parser.add_argument("--real-embeddings", action="store_true",
+                        help="use the real sentence-transformer model (must already be downloaded)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--data-dir", default=os.path.join(".cache", "benchmark"),
+                        help="where the synthetic exports are kept (default: %(default)s)")
+    parser.add_argument("--json", help="write the full results to this JSON file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        print(json.dumps(run_size(json.loads(args.child))))
+        return 0
+
+    results = []
+    for rows in args.sizes:
+        config = dict(vars(args), rows=rows)
+        config.pop("child")
+        config.pop("sizes")
+        started = time.perf_counter()
+        child = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", json.dumps(config)],
+            capture_output=True, text=True,
+        )
+        if child.returncode != 0:
+            print(f"{rows} tickets: benchmark failed\n{child.stderr}", file=sys.stderr)
+            return 1
+        results += json.loads(child.stdout.strip().splitlines()[-1])
+        print(f"{rows} tickets done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": {key: value for key, value in vars(args).items() if key != "child"},
+                       "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
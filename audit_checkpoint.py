@@ -0,0 +1,68 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+
+# Per-ticket results of an audit run, written to SQLite as each LLM task completes. A run that dies
+# part way through (an escaped exception, a dropped browser tab, a Groq rate limit) can be started
+# again on the same export and only the tickets without a stored result are sent to the model.
+#
+# Rows are keyed by (run_key, RequestID, question column). The run key identifies the export being
+# audited (see run_key_for_bytes) together with the settings its verdicts depend on (see
+# run_key_with_settings), so a resumed run never picks up results of another model or mode.
+class AuditCheckpoint:
+    def __init__(self, cache_dir=".cache"):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "audit_checkpoints.sqlite")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " run_key TEXT NOT NULL, request_id TEXT NOT NULL, question TEXT NOT NULL, result TEXT NOT NULL,"
+            " PRIMARY KEY (run_key, request_id, question))"
+        )
+        self._conn.commit()
+
+    def load(self, run_key):
+        # {(request_id, question): result} for everything already completed in this run
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT request_id, question, result FROM results WHERE run_key = ?", (run_key,)
+            ).fetchall()
+        return {(request_id, question): json.loads(result) for request_id, question, result in rows}
+
+    def save(self, run_key, request_id, results):
+        # results is {question: result} as returned by one LLM task
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO results (run_key, request_id, question, result) VALUES (?, ?, ?, ?)",
+                [(run_key, request_id, question, json.dumps(result)) for question, result in results.items()],
+            )
+            self._conn.commit()
+
+    def clear(self, run_key):
+        with self._lock:
+            self._conn.execute("DELETE FROM results WHERE run_key = ?", (run_key,))
+            self._conn.commit()
+
+
+def run_key_for_bytes(data):
+    # Run key of an uploaded / on-disk export: the hash of its file contents
+    return hashlib.sha256(data).hexdigest()
+
+
+def run_key_for_file(path, block_size=1 << 20):
+    # Same key as run_key_for_bytes, hashed block by block so large exports are not read into memory
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def run_key_with_settings(export_key, settings):
+    # Run key of an export audited under settings (a JSON-serializable dict: backend, model, modes)
+    payload = json.dumps([export_key, settings], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
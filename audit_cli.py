@@ -0,0 +1,179 @@
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+from dotenv import load_dotenv
+
+import audit_engine
+from audit_checkpoint import run_key_for_file
+from export_reader import EXPORT_CHUNK_SIZE, iter_export_chunks
+from llm_backends import LLM_BACKENDS
+from audit_metrics import AUDIT_METRICS_ENABLED, AUDIT_METRICS_PATH, summary_line, write_run_metrics
+from report_writer import REPORT_SIDECAR_FORMAT, SIDECAR_FORMATS, ReportWriter, sidecar_path
+from rule_prefilter import load_rules
+from resolution_clusters import RESOLUTION_CLUSTER_THRESHOLD
+from service_catalog import SERVICE_CATALOG_PATH
+from verdict_classifier import VERDICT_CLASSIFIER_PATH
+
+# Headless audit runner, e.g. for a nightly scheduled job:
+#
+#   python audit_cli.py Current_day_by_Technician.xlsx
+#   python audit_cli.py day1.xlsx day2.xlsx --output-dir reports --max-concurrency 16 --no-cache
+#   python audit_cli.py Current_day_by_Technician.xlsx --llm-backend openai   # llama.cpp / vLLM on our own box
+#
+# Each input export is audited against the template and written to its own report.
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the service desk ticket audit without the Streamlit UI.")
+    parser.add_argument("inputs", nargs="+", help="Current_day_by_Technician export(s) (.xlsx)")
+    parser.add_argument("--template", default=audit_engine.DEFAULT_TEMPLATE_PATH,
+                        help="audit template workbook (default: %(default)s)")
+    parser.add_argument("--output", help="report path; only valid with a single input")
+    parser.add_argument("--output-dir", default=".",
+                        help="directory for the reports when --output is not given (default: %(default)s)")
+    parser.add_argument("--llm-backend", choices=LLM_BACKENDS, default=audit_engine.LLM_BACKEND,
+                        help="Groq, an OpenAI-compatible server of our own (LOCAL_LLM_BASE_URL) or an in-process "
+                             "transformers model (default: %(default)s)")
+    parser.add_argument("--llm-model", help="model name for the chosen backend (default: the backend's configured model)")
+    parser.add_argument("--max-concurrency", type=int, default=audit_engine.LLM_MAX_CONCURRENCY,
+                        help="maximum LLM calls in flight (default: %(default)s)")
+    parser.add_argument("--resolution-mode", choices=["combined", "separate"], default=audit_engine.RESOLUTION_EVAL_MODE,
+                        help="ask Q-3/Q-5/Q-6 in one JSON call or one call per question (default: %(default)s)")
+    parser.add_argument("--subject-mode", choices=audit_engine.SUBJECT_CHECK_MODES, default=audit_engine.SUBJECT_CHECK_MODE,
+                        help="Q-2 engine: LLM-generated subject, local embeddings only, or LLM verdicts compared "
+                             "with the local engine (default: %(default)s)")
+    parser.add_argument("--service-catalog", default=SERVICE_CATALOG_PATH,
+                        help="service catalog subject prefixes are checked against, if it exists (default: %(default)s)")
+    parser.add_argument("--no-service-catalog", action="store_true", help="do not check subject prefixes")
+    parser.add_argument("--classifier", default=VERDICT_CLASSIFIER_PATH,
+                        help="Q-3/Q-5/Q-6 classifier trained with verdict_classifier.py, used if it exists (default: %(default)s)")
+    parser.add_argument("--no-classifier", action="store_true", help="send every Q-3/Q-5/Q-6 ticket to the LLM")
+    parser.add_argument("--no-rules", action="store_true", help="disable the rule-based fast path")
+    parser.add_argument("--rules", default=audit_engine.PREFILTER_RULES_PATH, help="JSON file with fast-path rules")
+    parser.add_argument("--no-coalesce", action="store_true",
+                        help="call the LLM for every ticket even when another ticket of the run has the same input")
+    parser.add_argument("--cluster-resolutions", action=argparse.BooleanOptionalAction,
+                        default=audit_engine.RESOLUTION_CLUSTERING_ENABLED,
+                        help="ask Q-3/Q-5/Q-6 once per cluster of paraphrased resolutions (default: %(default)s)")
+    parser.add_argument("--cluster-threshold", type=float, default=RESOLUTION_CLUSTER_THRESHOLD,
+                        help="cosine similarity from which resolutions are clustered (default: %(default)s)")
+    parser.add_argument("--no-compaction", action="store_true",
+                        help="send resolutions and issue descriptions to the model verbatim")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the LLM response cache")
+    parser.add_argument("--cache-dir", default=audit_engine.LLM_CACHE_DIR,
+                        help="LLM response cache, embedding cache, checkpoint and ledger directory (default: %(default)s)")
+    parser.add_argument("--no-embedding-cache", action="store_true",
+                        help="encode every Q-2 subject and resolution with the model instead of reusing stored embeddings")
+    parser.add_argument("--no-checkpoint", action="store_true",
+                        help="do not checkpoint per-ticket results or resume an interrupted run")
+    parser.add_argument("--no-ledger", action="store_true",
+                        help="re-audit every ticket instead of reusing verdicts of tickets unchanged since an earlier run")
+    parser.add_argument("--sidecar", choices=SIDECAR_FORMATS, default=REPORT_SIDECAR_FORMAT or None,
+                        help="also write the report rows to a .csv or .parquet file next to each report")
+    parser.add_argument("--metrics-file", default=AUDIT_METRICS_PATH if AUDIT_METRICS_ENABLED else None,
+                        help="append each run's timing and LLM usage summary to this JSONL file (default: %(default)s)")
+    parser.add_argument("--no-metrics", action="store_true", help="do not write the metrics file")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE,
+                        help="tickets read from the export and audited per batch (default: %(default)s)")
+    args = parser.parse_args(argv)
+    if args.output and len(args.inputs) > 1:
+        parser.error("--output can only be used with a single input; use --output-dir instead")
+    return args
+
+
+def report_path(args, input_path):
+    if args.output:
+        return args.output
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    name = audit_engine.REPORT_FILE_NAME.replace(".xlsx", f"_{stem}.xlsx")
+    return os.path.join(args.output_dir, name)
+
+
+def main(argv=None):
+    load_dotenv()
+    args = parse_args(argv)
+
+    # Models and cache are loaded once and shared by every input of this invocation
+    chat = audit_engine.load_chat_model(args.llm_backend, args.llm_model)
+    semantic_model = audit_engine.load_semantic_model()
+    llm_cache = None if args.no_cache else audit_engine.open_llm_cache(args.cache_dir)
+    embedding_cache = None
+    if audit_engine.EMBEDDING_CACHE_ENABLED and not args.no_embedding_cache:
+        embedding_cache = audit_engine.open_embedding_cache(args.cache_dir)
+    checkpoint = None if args.no_checkpoint else audit_engine.open_checkpoint(args.cache_dir)
+    ledger = None if args.no_ledger else audit_engine.open_ledger(args.cache_dir)
+    rules = [] if args.no_rules else load_rules(args.rules)
+    service_catalog = None if args.no_service_catalog else audit_engine.open_service_catalog(args.service_catalog)
+    verdict_classifier = None if args.no_classifier else audit_engine.open_verdict_classifier(args.classifier)
+    template_df = pd.read_excel(args.template)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    failed = 0
+    for input_path in args.inputs:
+        started = time.perf_counter()
+        try:
+            ctx = audit_engine.AuditContext(
+                chat, semantic_model, llm_cache,
+                max_workers=args.max_concurrency, resolution_mode=args.resolution_mode, rules=rules,
+                checkpoint=checkpoint, run_key=run_key_for_file(input_path), ledger=ledger,
+                embedding_cache=embedding_cache, subject_mode=args.subject_mode, service_catalog=service_catalog,
+                verdict_classifier=verdict_classifier, coalesce=audit_engine.LLM_COALESCE_ENABLED and not args.no_coalesce,
+                resolution_clustering=args.cluster_resolutions, cluster_threshold=args.cluster_threshold,
+                prompt_compaction=audit_engine.PROMPT_COMPACTION_ENABLED and not args.no_compaction,
+            )
+            # The export is parsed and audited in chunks of --chunk-size tickets, and each chunk's
+            # report rows are written out as soon as it finishes
+            chunks = iter_export_chunks(input_path, args.chunk_size)
+            output_path = report_path(args, input_path)
+            outputs = [output_path] + ([sidecar_path(output_path, args.sidecar)] if args.sidecar else [])
+            with ReportWriter(output_path, args.sidecar, outputs[1] if args.sidecar else None) as writer:
+                for report_chunk in audit_engine.iter_audit(ctx, chunks, template_df):
+                    with ctx.metrics.stage("excel_write"):
+                        writer.write(report_chunk)
+                write_started = time.perf_counter()
+            ctx.metrics.add_stage("excel_write", time.perf_counter() - write_started)  # closing saves the workbook
+            stats = ctx.stats
+            if not stats['tickets']:
+                for path in outputs:
+                    os.remove(path)
+                print(f"{input_path}: no tickets, skipped")
+                continue
+        except Exception as e:
+            failed += 1
+            print(f"{input_path}: audit failed: {e}", file=sys.stderr)
+            continue
+
+        print(
+            f"{input_path}: {stats['tickets']} tickets -> {', '.join(outputs)} in {time.perf_counter() - started:.1f}s "
+            f"(LLM calls {stats['llm_calls']}, avoided by rules {stats['llm_calls_avoided']}, "
+            f"shared by identical inputs {stats['llm_calls_coalesced']}, "
+            f"unchanged {stats['tasks_unchanged']}, resumed {stats['tasks_resumed']}, "
+            f"cache hits {stats['cache_hits']}, misses {stats['cache_misses']}, LLM errors {stats['llm_errors']})"
+        )
+        metrics = ctx.summary(export=input_path)
+        print(f"  {summary_line(metrics)}")
+        if service_catalog is not None:
+            print(f"  {stats['services_flagged']} subjects with a service that is not in the catalog")
+        if verdict_classifier is not None:
+            print(f"  {stats['classifier_answers']} Q-3/Q-5/Q-6 verdicts answered by the classifier")
+        if args.cluster_resolutions:
+            agreement = "n/a" if metrics['cluster_agreement'] is None else f"{metrics['cluster_agreement']:.1%}"
+            print(f"  {stats['resolutions_clustered']} resolutions answered by their cluster's representative "
+                  f"({stats['resolution_clusters']} clusters, {stats['resolution_clusters_low_cohesion']} too loose); "
+                  f"agreement on {stats['cluster_checks']} spot-checked members {agreement}")
+        if stats['fields_compacted']:
+            print(f"  {stats['fields_compacted']} resolutions / issue descriptions compacted "
+                  f"({stats['fields_truncated']} cut to the token budget), ~{stats['prompt_tokens_saved']} prompt tokens saved")
+        if metrics['subject_agreement'] is not None:
+            print(f"  Q-2 local engine agrees with the LLM engine on {metrics['subject_agreement']:.1%} "
+                  f"of {stats['subjects_compared']} tickets")
+        if args.metrics_file and not args.no_metrics:
+            write_run_metrics(metrics, args.metrics_file)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1156 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from cachetools import LRUCache
+
+from audit_checkpoint import AuditCheckpoint, run_key_with_settings
+from audit_ledger import AuditLedger, ticket_content_hash
+from audit_metrics import RunMetrics, token_usage
+from embedding_cache import EmbeddingCache, normalize_text
+from llm_cache import LLMResponseCache
+from llm_backends import OpenAICompatibleChat, TransformersChat
+from llm_client import RateLimitedChat, estimate_tokens
+from prompt_compaction import PROMPT_ISSUE_DESCRIPTION_TOKEN_BUDGET, PROMPT_RESOLUTION_TOKEN_BUDGET, compact_text
+from report_writer import ReportWriter
+from resolution_clusters import RESOLUTION_CLUSTER_CHECK_RATE, RESOLUTION_CLUSTER_THRESHOLD, cluster_representatives
+from rule_prefilter import SUBJECT_FORMAT, apply_rules
+from service_catalog import SERVICE_CATALOG_PATH, load_service_catalog
+from verdict_classifier import VERDICT_CLASSIFIER_PATH, load_verdict_classifier
+
+# Shared audit engine used by the Streamlit page (finalAudit_Streamlite.py) and the command line
+# runner (audit_cli.py). Defaults come from the environment (.env) and can be overridden per run.
+
+CHAT_MODEL_NAME = "llama-3.3-70b-versatile"
+SEMANTIC_MODEL_NAME = "all-MiniLM-L6-v2"
+# Chat backend (see llm_backends.py): "groq", "openai" for an OpenAI-compatible server of our own
+# (llama.cpp, vLLM) at LOCAL_LLM_BASE_URL, or "transformers" for a small model run in process
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")
+LOCAL_LLM_BASE_URL = os.getenv("LOCAL_LLM_BASE_URL", "http://127.0.0.1:8080/v1")
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "local-model")
+TRANSFORMERS_MODEL = os.getenv("TRANSFORMERS_MODEL", "Qwen/Qwen2.5-0.5B-Instruct")
+TRANSFORMERS_MAX_NEW_TOKENS = int(os.getenv("TRANSFORMERS_MAX_NEW_TOKENS", "128"))
+# CPU threads used by torch for the embedding forward passes, and how many strings are encoded per batch
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", str(os.cpu_count() or 1)))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+# Persistent embedding store for Q-2 strings and resolutions (in LLM_CACHE_DIR) and how many
+# vectors its in-memory LRU layer keeps
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "10000"))
+# Maximum number of Groq calls in flight at once
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# On-disk LLM response cache; reruns of the same export are served from here instead of Groq
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", ".cache")
+# Send each distinct task input (resolution, issue description; whitespace and case ignored) once per
+# run and fan its verdicts out to every ticket with the same input
+LLM_COALESCE_ENABLED = os.getenv("LLM_COALESCE_ENABLED", "true").lower() == "true"
+LLM_COALESCE_MAX_ENTRIES = int(os.getenv("LLM_COALESCE_MAX_ENTRIES", "100000"))
+# Ask Q-3/Q-5/Q-6 once per cluster of paraphrased resolutions (see resolution_clusters.py) and give the
+# representative's verdicts to the other members
+RESOLUTION_CLUSTERING_ENABLED = os.getenv("RESOLUTION_CLUSTERING_ENABLED", "false").lower() == "true"
+# Strip e-mail noise from the resolutions and issue descriptions sent to the model and cut them to a
+# token budget (see prompt_compaction.py)
+PROMPT_COMPACTION_ENABLED = os.getenv("PROMPT_COMPACTION_ENABLED", "true").lower() == "true"
+# Regex fast path that answers obvious tickets without an LLM call (PREFILTER_RULES_PATH swaps in a JSON rule file)
+PREFILTER_ENABLED = os.getenv("PREFILTER_ENABLED", "true").lower() == "true"
+PREFILTER_RULES_PATH = os.getenv("PREFILTER_RULES_PATH")
+# Groq quota the shared client throttles to, and how often a retryable error (429, 5xx, timeout) is retried
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+GROQ_TOKENS_PER_MINUTE = int(os.getenv("GROQ_TOKENS_PER_MINUTE", "12000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+# Checkpoint per-ticket results so an interrupted run of the same export resumes where it stopped
+CHECKPOINT_ENABLED = os.getenv("AUDIT_CHECKPOINT_ENABLED", "true").lower() == "true"
+# Keep verdicts across runs and only re-audit tickets that are new or changed since they were last seen
+LEDGER_ENABLED = os.getenv("AUDIT_LEDGER_ENABLED", "true").lower() == "true"
+# "combined" asks Q-3/Q-5/Q-6 in one JSON call per resolution, "separate" uses one prompt per question
+RESOLUTION_EVAL_MODE = os.getenv("RESOLUTION_EVAL_MODE", "combined")
+
+# Q-2 engine: "llm" has the model write an ideal subject and compares it with the actual one, "local"
+# checks the SERVICE - description format and embeds the issue description against the subject without
+# any model call, and "compare" keeps the LLM verdicts while counting how often the local engine agrees
+SUBJECT_CHECK_MODES = ["llm", "local", "compare"]
+SUBJECT_CHECK_MODE = os.getenv("SUBJECT_CHECK_MODE", "llm")
+# Description/subject similarity the local engine accepts; subject_calibration.py writes a threshold
+# calibrated on audited workbooks to LOCAL_SUBJECT_CALIBRATION_PATH, which wins over the default
+LOCAL_SUBJECT_THRESHOLD = float(os.getenv("LOCAL_SUBJECT_THRESHOLD", "0.35"))
+LOCAL_SUBJECT_CALIBRATION_PATH = os.getenv(
+    "LOCAL_SUBJECT_CALIBRATION_PATH", os.path.join(LLM_CACHE_DIR, "subject_calibration.json")
+)
+
+# Verdict recorded when the model could not be reached; the error itself goes to Notes
+LLM_ERROR_VERDICT = "LLM error"
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATE_PATH = os.path.join('doc', 'doc1', 'Service_Desk_Incident_Management_Ticket_Audits.xlsx')
+REPORT_FILE_NAME = "Updated_Service_Desk_Incident_Management_Ticket_Audits.xlsx"
+
+
+# Loaders for the heavy resources. Callers keep one instance per process (st.cache_resource in the
+# Streamlit page, a single call per invocation in the CLI) and share it between runs.
+def load_chat_model(backend=LLM_BACKEND, model_name=None, temperature=0):
+    if backend == "openai":
+        # Our own server has no quota to stay under; only the retries of RateLimitedChat apply
+        chat = OpenAICompatibleChat(LOCAL_LLM_BASE_URL, model_name or LOCAL_LLM_MODEL, temperature,
+                                    api_key=os.getenv("LOCAL_LLM_API_KEY"))
+        return RateLimitedChat(chat, requests_per_minute=None, tokens_per_minute=None, max_retries=LLM_MAX_RETRIES)
+    if backend == "transformers":
+        chat = TransformersChat(model_name or TRANSFORMERS_MODEL, temperature,
+                                max_new_tokens=TRANSFORMERS_MAX_NEW_TOKENS, threads=EMBEDDING_THREADS)
+        return RateLimitedChat(chat, requests_per_minute=None, tokens_per_minute=None, max_retries=0)
+    if backend != "groq":
+        raise ValueError(f"Unknown LLM backend '{backend}'")
+
+    from langchain_groq import ChatGroq
+
+    # Ensure that your Groq API Key is set as an environment variable
+    if not os.getenv("GROQ_API_KEY"):
+        raise ValueError("API key for Groq is missing. Please set the GROQ_API_KEY environment variable.")
+    # GROQ_API_BASE points the client at another endpoint, e.g. stub_llm_server.py for load tests.
+    # Retries are done by RateLimitedChat, so the Groq SDK's own retries are turned off.
+    chat = ChatGroq(temperature=temperature, model_name=model_name or CHAT_MODEL_NAME, max_retries=0,
+                    groq_api_base=os.getenv("GROQ_API_BASE"))
+    return RateLimitedChat(
+        chat,
+        requests_per_minute=GROQ_REQUESTS_PER_MINUTE,
+        tokens_per_minute=GROQ_TOKENS_PER_MINUTE,
+        max_retries=LLM_MAX_RETRIES,
+    )
+
+
+def load_semantic_model(model_name=SEMANTIC_MODEL_NAME, threads=EMBEDDING_THREADS):
+    from sentence_transformers import SentenceTransformer
+    import torch
+
+    torch.set_num_threads(threads)
+    return SentenceTransformer(model_name)
+
+
+def open_llm_cache(cache_dir=LLM_CACHE_DIR):
+    return LLMResponseCache(
+        cache_dir=cache_dir,
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000")),
+        max_age_days=int(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "30")),
+    )
+
+
+def open_embedding_cache(cache_dir=LLM_CACHE_DIR, model_name=SEMANTIC_MODEL_NAME):
+    return EmbeddingCache(model_name, cache_dir=cache_dir, memory_entries=EMBEDDING_CACHE_MEMORY_ENTRIES)
+
+
+def load_local_subject_threshold(path=LOCAL_SUBJECT_CALIBRATION_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return float(json.load(f)["threshold"])
+    except FileNotFoundError:
+        return LOCAL_SUBJECT_THRESHOLD
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"Ignoring unreadable subject calibration {path}: {e}")
+        return LOCAL_SUBJECT_THRESHOLD
+
+
+def open_service_catalog(path=SERVICE_CATALOG_PATH):
+    # None until a catalog has been built with service_catalog.py
+    return load_service_catalog(path)
+
+
+def open_verdict_classifier(path=VERDICT_CLASSIFIER_PATH):
+    # None until a classifier has been trained with verdict_classifier.py
+    return load_verdict_classifier(path)
+
+
+def open_checkpoint(cache_dir=LLM_CACHE_DIR):
+    return AuditCheckpoint(cache_dir=cache_dir)
+
+
+def open_ledger(cache_dir=LLM_CACHE_DIR):
+    return AuditLedger(cache_dir=cache_dir)
+
+
+# Everything a single audit run needs: the shared model handles, this run's options and its counters.
+# The check functions below take it as their first argument, so several runs can be in flight at once.
+class AuditContext:
+    def __init__(self, chat, semantic_model, llm_cache=None, max_workers=LLM_MAX_CONCURRENCY,
+                 resolution_mode=RESOLUTION_EVAL_MODE, rules=None, embedding_batch_size=EMBEDDING_BATCH_SIZE,
+                 checkpoint=None, run_key=None, ledger=None, embedding_cache=None, subject_mode=SUBJECT_CHECK_MODE,
+                 subject_threshold=None, service_catalog=None, verdict_classifier=None,
+                 coalesce=LLM_COALESCE_ENABLED, resolution_clustering=RESOLUTION_CLUSTERING_ENABLED,
+                 cluster_threshold=RESOLUTION_CLUSTER_THRESHOLD, cluster_check_rate=RESOLUTION_CLUSTER_CHECK_RATE,
+                 prompt_compaction=PROMPT_COMPACTION_ENABLED):
+        self.chat = chat
+        self.semantic_model = semantic_model
+        self.llm_cache = llm_cache  # None disables the response cache
+        self.max_workers = max_workers
+        self.resolution_mode = resolution_mode
+        self.rules = rules  # None or [] disables the rule fast path
+        self.embedding_batch_size = embedding_batch_size
+        self.checkpoint = checkpoint  # None disables checkpointing; needs run_key to identify the export
+        self.ledger = ledger  # None re-audits every ticket of the export
+        self.embedding_cache = embedding_cache  # None encodes every string with the model
+        self.subject_mode = subject_mode
+        self.subject_threshold = load_local_subject_threshold() if subject_threshold is None else subject_threshold
+        self.service_catalog = service_catalog  # None skips the subject prefix check against the service catalog
+        self.verdict_classifier = verdict_classifier  # None sends every Q-3/Q-5/Q-6 ticket to the LLM
+        self.coalesce = coalesce
+        self.resolution_clustering = resolution_clustering
+        self.cluster_threshold = cluster_threshold
+        self.cluster_check_rate = cluster_check_rate
+        self.prompt_compaction = prompt_compaction
+        # The export's key combined with everything the checkpointed verdicts depend on
+        self.run_key = None if run_key is None else run_key_with_settings(run_key, {
+            "backend": getattr(chat, "backend", "groq"), "model": getattr(chat, "model_name", None),
+            "resolution_mode": resolution_mode, "subject_mode": subject_mode,
+            "prompt_compaction": prompt_compaction and PROMPT_TOKEN_BUDGETS,
+            "resolution_clustering": resolution_clustering and cluster_threshold,
+        })
+        # LLM tasks sent in this run by (task, normalized input digest), shared by every ticket of the run
+        # with the same input: the Future while the call is in flight, then only its {column: result}.
+        # LRU-bounded, so a large export keeps the memory bound of its chunked reading.
+        self.coalesced = LRUCache(maxsize=LLM_COALESCE_MAX_ENTRIES)
+        # Per task label: tickets that needed the task and distinct inputs actually sent
+        self.coalescing = {}
+        self.stats = {
+            "tickets": 0, "llm_calls": 0, "llm_calls_avoided": 0, "tasks_resumed": 0, "tasks_unchanged": 0,
+            "cache_hits": 0, "cache_misses": 0, "llm_errors": 0, "subjects_compared": 0, "subjects_agreed": 0,
+            "services_flagged": 0, "classifier_answers": 0, "llm_calls_coalesced": 0,
+            "resolution_clusters": 0, "resolution_clusters_low_cohesion": 0, "resolutions_clustered": 0,
+            "cluster_checks": 0, "cluster_checks_agreed": 0, "fields_compacted": 0, "fields_truncated": 0,
+            "prompt_tokens_saved": 0,
+        }
+        # Tickets whose answer is known so far, per LLM-backed question (Q-2, Q-3, Q-5, Q-6), for progress displays
+        self.questions_done = {}
+        self.metrics = RunMetrics()
+        self._lock = threading.Lock()
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.stats[name] += n
+
+    def question_done(self, columns):
+        with self._lock:
+            for column in columns:
+                label = COLUMN_RENAME_MAP[column]
+                self.questions_done[label] = self.questions_done.get(label, 0) + 1
+
+    def tickets_done(self):
+        # Tickets whose LLM-backed questions are all answered. questions_done moves with every finished task,
+        # where stats["tickets"] only moves once a whole chunk is done.
+        labels = [COLUMN_RENAME_MAP[column] for columns, _, _ in build_llm_tasks(self) for column in columns]
+        with self._lock:
+            answered = min((self.questions_done.get(label, 0) for label in labels), default=0)
+            return max(answered, self.stats["tickets"])
+
+    def count_coalescing(self, label, tickets, unique):
+        with self._lock:
+            counts = self.coalescing.setdefault(label, {"tickets": 0, "unique": 0})
+            counts["tickets"] += tickets
+            counts["unique"] += unique
+
+    def summary(self, **fields):
+        # The run's metrics record (see audit_metrics.RunMetrics.summary) with its counters and Q-2 engine
+        with self._lock:
+            stats = dict(self.stats)
+            coalescing = {
+                label: {**counts, "ratio": round(counts["unique"] / counts["tickets"], 3) if counts["tickets"] else None}
+                for label, counts in self.coalescing.items()
+            }
+        agreement = None
+        if stats["subjects_compared"]:
+            agreement = round(stats["subjects_agreed"] / stats["subjects_compared"], 3)
+        cluster_agreement = None
+        if stats["cluster_checks"]:
+            cluster_agreement = round(stats["cluster_checks_agreed"] / stats["cluster_checks"], 3)
+        backend = getattr(self.chat, "backend", "groq")
+        return self.metrics.summary(
+            stats["tickets"], **fields, llm_backend=backend, chat_model=getattr(self.chat, "model_name", None),
+            subject_mode=self.subject_mode, subject_agreement=agreement, cluster_agreement=cluster_agreement,
+            coalescing=coalescing, stats=stats,
+            priced=backend == "groq",
+        )
+
+
+def invoke_llm(ctx, prompt, question=None):
+    # Send a single prompt to the chat model and return the raw response text.
+    # Identical (prompt, model, temperature) requests are answered from the on-disk cache.
+    # Calls that reach the model are recorded in ctx.metrics under `question`.
+    key = None
+    if ctx.llm_cache is not None:
+        key = ctx.llm_cache.make_key(prompt, ctx.chat.model_name, ctx.chat.temperature)
+        cached = ctx.llm_cache.get(key)
+        ctx.count("cache_hits" if cached is not None else "cache_misses")
+        if cached is not None:
+            return cached
+
+    started = time.perf_counter()
+    try:
+        response = ctx.chat.invoke([prompt])  # Pass the prompt inside a list
+    except Exception:
+        ctx.metrics.record_call(question, time.perf_counter() - started, failed=True)
+        raise
+    ctx.metrics.record_call(question, time.perf_counter() - started, *token_usage(response))
+
+    if key is not None:
+        ctx.llm_cache.put(key, response.content)
+    return response.content
+
+
+# Audit template question columns
+Q1_COLUMN = 'Has the "Requester Name" been updated to reflect who the ticket is for? (Section 2b)'
+Q2_COLUMN = 'Has the ticket "Subject" been updated to leverage the naming convention "SERVICE - Brief Description of Issue or Request"? (Section 5a ix)'
+Q3_COLUMN = 'Did the technician search for and note a relevant Solution article, if one exists? (Section 8b)'
+Q5_COLUMN = 'Are the resolutions notes clearly and fully documented, including the exact steps taken for resolution? (Section 10a)'
+Q6_COLUMN = 'If no solution article existed, did the technician submit a new solution article request? (Section 10e)'
+Q4_COLUMN = 'Did the technician provide clear and detailed notes, documenting all steps taking during troubleshooting? (Section 9)'
+
+
+# Q-1: "Yes" unless a phone / service portal ticket was raised on behalf of someone other than the
+# requester. Evaluated column-wise over the whole export.
+def check_requester_name(current_day_df):
+    request_mode = current_day_df['Request Mode'].astype(str).str.lower()
+    on_behalf_of = current_day_df['On Behalf Of User']
+    requester_ok = (
+        ~request_mode.isin(['phone', 'service portal']) |
+        on_behalf_of.isna() |
+        (on_behalf_of.astype(str).str.lower() == 'not assigned') |
+        (current_day_df['Requester'] == on_behalf_of)
+    )
+    return pd.Series(np.where(requester_ok, "Yes", "Manual Audit required"), index=current_day_df.index)
+
+
+def log_llm_error(ctx, task, error):
+    # Once per failed call, whichever backend served it and however many questions it answered
+    logger.error("Chat model call for %s failed (%s/%s): %s",
+                 task, getattr(ctx.chat, "backend", "groq"), ctx.chat.model_name, error)
+
+
+def llm_error_result(question, error):
+    # (verdict, note) for a question whose model call failed after all retries
+    return LLM_ERROR_VERDICT, f" |{question}- LLM error: {error}"
+
+
+# Every check below returns a (verdict, note) pair instead of writing into audit_df, so the
+# checks can run on worker threads. The note is appended to the row's Notes column (or None).
+# Q-2 is the exception: the LLM only generates a subject here, and score_subjects compares all
+# generated and actual subjects in one batched embedding pass once the LLM calls are done
+# (a failed call returns its final (verdict, note) pair instead of a subject).
+def generate_subject_with_model(ctx, issue_description, actual_subject):
+    if pd.isna(issue_description) or pd.isna(actual_subject):
+        return None
+
+    prompt = f"""
+    Generate a subject header for the following issue description. The subject line should begin with the service name in UPPERCASE, followed by a hyphen (-) and then a brief and clear description of the issue.
+    - Correct Example: CLOCK - Adjust and Add EST clock Here, "CLOCK" is the service name in uppercase, followed by a hyphen and a short issue description.
+    - Incorrect Example: Password Reset - Password Expired In this example, the service name is not in uppercase, which doesn’t meet the formatting requirement.
+
+    Issue Description: "{issue_description}"
+
+    Generated Subject Header:
+    """
+
+    try:
+        return invoke_llm(ctx, prompt, "Q-2").strip()
+    except Exception as e:
+        log_llm_error(ctx, "Q-2", e)
+        return llm_error_result("Q2", e)
+
+
+def encode_texts(ctx, texts):
+    # Embeddings of texts as a tensor; with an embedding cache only strings it has not seen are encoded
+    if ctx.embedding_cache is None:
+        ctx.metrics.record_embeddings(len(texts), encoded=len(texts))
+        return ctx.semantic_model.encode(texts, batch_size=ctx.embedding_batch_size, convert_to_tensor=True)
+    import torch
+
+    vectors, counts = ctx.embedding_cache.encode(ctx.semantic_model, texts, ctx.embedding_batch_size)
+    ctx.metrics.record_embeddings(**counts)
+    return torch.from_numpy(vectors)
+
+
+def pair_similarities(ctx, left_texts, right_texts, positions):
+    # {position: cosine similarity of left_texts[position] and right_texts[position]}, all pairs in one encode
+    from sentence_transformers import util
+
+    if not positions:
+        return {}
+    with ctx.metrics.stage("embedding"):
+        embeddings = encode_texts(
+            ctx, [str(left_texts[position]) for position in positions] + [str(right_texts[position]) for position in positions]
+        )
+        scores = util.pairwise_cos_sim(embeddings[:len(positions)], embeddings[len(positions):]).tolist()
+    return dict(zip(positions, scores))
+
+
+def score_subjects(ctx, issue_descriptions, actual_subjects, generated_subjects):
+    # Q-2: encode every generated and actual subject of the run in large batches, then take the
+    # cosine similarity of each (generated, actual) pair in one vectorized operation
+    pairs = [
+        position for position, generated_subject in enumerate(generated_subjects)
+        if isinstance(generated_subject, str)
+    ]
+    similarity_scores = pair_similarities(ctx, generated_subjects, actual_subjects, pairs)
+
+    results = []
+    for position, generated_subject in enumerate(generated_subjects):
+        if pd.isna(issue_descriptions[position]) or pd.isna(actual_subjects[position]):
+            results.append(("Manual Audit required", None))
+        elif generated_subject is None:
+            results.append(("Manual audit required", None))  # Not asked (decided by a rule)
+        elif isinstance(generated_subject, tuple):
+            results.append(generated_subject)  # The model call failed
+        elif similarity_scores[position] >= 0.60:
+            results.append(("Yes", None))
+        else:
+            similarity_score = similarity_scores[position]
+            results.append(("Manual audit required", " |Q2- " + generated_subject + "-" + str(similarity_score)))
+    return results
+
+
+SUBJECT_FORMAT_PATTERN = re.compile(SUBJECT_FORMAT)
+
+
+def score_subjects_locally(ctx, issue_descriptions, actual_subjects, positions=None):
+    # Local Q-2 engine: the subject has to follow "SERVICE - Brief Description" and be about the issue
+    # described, judged by the similarity of the description and subject embeddings against the
+    # calibrated threshold. positions limits the check to those tickets (None elsewhere).
+    positions = range(len(actual_subjects)) if positions is None else positions
+    results = [None] * len(actual_subjects)
+    formatted = []
+    for position in positions:
+        if pd.isna(issue_descriptions[position]) or pd.isna(actual_subjects[position]):
+            results[position] = ("Manual Audit required", None)
+        elif not SUBJECT_FORMAT_PATTERN.match(str(actual_subjects[position]).strip()):
+            results[position] = ("Manual audit required", " |Q2- Subject does not follow 'SERVICE - Brief Description'")
+        else:
+            formatted.append(position)
+
+    for position, score in pair_similarities(ctx, issue_descriptions, actual_subjects, formatted).items():
+        if score >= ctx.subject_threshold:
+            results[position] = ("Yes", None)
+        else:
+            results[position] = ("Manual audit required", f" |Q2- Subject does not match the description-{score}")
+    return results
+
+
+def count_subject_agreement(ctx, llm_results, local_results):
+    # "compare" mode: how often the local Q-2 engine reaches the LLM engine's verdict ("Yes" or not)
+    compared = agreed = 0
+    for llm_result, local_result in zip(llm_results, local_results):
+        if llm_result is None or local_result is None or llm_result[0] == LLM_ERROR_VERDICT:
+            continue
+        compared += 1
+        agreed += (llm_result[0] == "Yes") == (local_result[0] == "Yes")
+    ctx.count("subjects_compared", compared)
+    ctx.count("subjects_agreed", agreed)
+
+
+# Map a lowercased model answer to the audit verdict and note for Q-3, Q-5 and Q-6.
+# Shared by the per-question prompts and the combined JSON prompt.
+def interpret_q3_response(response_text):
+    if "yes" in response_text or "new article submitted" in response_text:
+        return "Yes", None
+    return "Manual audit required", " |Q3- " + response_text
+
+
+def interpret_q5_response(response_text):
+    if "yes" in response_text or "new article submitted" in response_text:
+        return "Yes", None
+    # Update Notes only if it's not "yes"
+    return "Manual audit required", f" |Q5- No User Confirmation or Unclear Resolution: {response_text}"
+
+
+def interpret_q6_response(response_text):
+    # Normalize text
+    cleaned_text = response_text.replace(".", "").replace("–", "-").strip()
+    # print(cleaned_text)
+
+    # Return based on model's understanding of the context
+    if "n/a" in cleaned_text and "article" in cleaned_text:
+        return "n/a - Existing Article", None
+    elif "yes" in cleaned_text:
+        return "Yes", None
+    else:
+        return "No", None
+
+
+# Define the prompt for Groq model to check if solution article or "KBA" is mentioned
+def check_solution_article_with_groq(ctx, resolution):
+
+    # Prompt to send to the Groq model asking it to understand if the issue was auto-resolved or if KBA/Solution Article was followed or a new article submitted
+    prompt = f"""
+    Please read the following resolution and analyze it carefully. Based on the content of the resolution:
+    1. If the issue was auto-resolved(for example, the user resolved the issue themselves, or the issue resolved on its own or without manual intervention), please return 'Yes'.
+    2. If the technician referred to a Knowledge Base Article (KBA) or followed Solution Article steps to resolve the issue, return 'Yes'.
+    3. If the resolution describes a new KBA submitted (example- 'KBA -105' or 'KBA -106') or if a new solution article has been uploaded or submitted as part of resolving the issue, return 'New article submitted'.
+    4. If none of the above conditions are met, return 'Manual Audit required'.
+
+    Resolution: {resolution}
+
+    Response:
+    """
+
+    try:
+        # Pass the prompt to the Groq model and get the response
+        response_text = invoke_llm(ctx, prompt, "Q-3").strip().lower()  # Normalize to lowercase
+
+        return interpret_q3_response(response_text)
+    except Exception as e:
+        log_llm_error(ctx, "Q-3", e)
+        return llm_error_result("Q3", e)
+
+
+def check_solution_article_with_groq1(ctx, resolution):
+    # Define the prompt with instructions that require user confirmation
+    prompt = f"""
+    Read the resolution notes provided and analyze it based on the following criteria. Response should be determined by the presence of user confirmation in the resolution text.
+
+
+    Read the resolution notes provided and analyze it based on the following criteria. Response should be determined by the presence of user confirmation in the resolution text.
+
+    Evaluation Guidelines:
+
+    1.Auto-Resolved with User Confirmation:
+    If the issue resolved on its own (e.g., the user fixed it themselves or it resolved without intervention) and the user confirmed it, return: Yes
+
+    2.Existing KBA Followed with User Confirmation:
+    If the technician referred to a Knowledge Base Article (KBA) or followed documented solution steps, and the user confirmed the solution was followed and effective, return: Yes
+
+    3.New KBA Submission Based on User Feedback:
+    If the technician submitted a new KBA or solution article request and noted that it was based on user feedback, return: New article submitted
+
+    4.No User Confirmation or Unclear Resolution:
+    If none of the above conditions are met, or if user confirmation is not clearly mentioned, return: Manual audit required
+
+    Key Phrases to Look For (Examples of User Confirmation):
+    “User confirmed issue resolved on its own (i.e., auto-resolved)”
+    “User confirmed/acknowledged the issue is resolved and working as expected”
+
+    Resolution:
+    {resolution}
+
+    Your response:
+    """
+
+    try:
+        # Invoke the prompt with Groq
+        response_text = invoke_llm(ctx, prompt, "Q-5").strip().lower()  # Extract the response text and ensure it's lowercase
+        # print(response_text)
+        return interpret_q5_response(response_text)
+
+    except Exception as e:
+        log_llm_error(ctx, "Q-5", e)
+        return llm_error_result("Q5", e)
+
+
+def check_solution_article_with_groq2(ctx, resolution):
+    if not resolution or pd.isna(resolution):
+        return "No", None  # Handle missing or empty resolutions gracefully
+
+    # Define the prompt for Groq model
+    prompt = f"""
+    Please carefully analyze the following resolution and determine the appropriate response based on the context:
+    1. If the resolution describes the issue as being resolved automatically (for example, the user resolved the issue themselves, or the issue resolved on its own or without manual intervention), return 'n/a - Existing Article'.
+    2. If the resolution describes that the technician referred to or used a Knowledge Base Article (KBA) or followed the steps from a Solution article to resolve the issue, return 'n/a - Existing Article'.
+    3. If the resolution describes a new KBA submitted (example- 'KBA -105' or 'KBA -106') or if a new solution article has been uploaded or submitted as part of resolving the issue, return 'Yes'.
+    4. If none of the above conditions are met, return 'No'.
+
+    Resolution: {resolution}
+    """
+
+    try:
+        # Invoke the prompt with the Groq model
+        response_text = invoke_llm(ctx, prompt, "Q-6").strip().lower()  # Extract text from the first response object
+        # print(response_text)
+        return interpret_q6_response(response_text)
+
+    except Exception as e:
+        log_llm_error(ctx, "Q-6", e)
+        return llm_error_result("Q6", e)
+
+
+def check_resolution_combined(ctx, resolution):
+    # Ask the Q-3, Q-5 and Q-6 questions about one resolution in a single call.
+    # Returns {column: (verdict, note)} (LLM error results when the call fails after retries),
+    # or None when the answer is not the expected JSON.
+    prompt = f"""
+    Read the following resolution and answer three audit questions about it. Reply with a single JSON object only, no other text, using exactly these keys:
+    {{"q3": "...", "q5": "...", "q6": "..."}}
+
+    q3 - Was a solution article followed?
+    1. If the issue was auto-resolved (for example, the user resolved the issue themselves, or the issue resolved on its own or without manual intervention), answer 'Yes'.
+    2. If the technician referred to a Knowledge Base Article (KBA) or followed Solution Article steps to resolve the issue, answer 'Yes'.
+    3. If the resolution describes a new KBA submitted (example- 'KBA -105' or 'KBA -106') or if a new solution article has been uploaded or submitted as part of resolving the issue, answer 'New article submitted'.
+    4. If none of the above conditions are met, answer 'Manual Audit required'.
+
+    q5 - Is the resolution confirmed by the user?
+    1. If the issue resolved on its own (e.g., the user fixed it themselves or it resolved without intervention) and the user confirmed it, answer 'Yes'.
+    2. If the technician referred to a KBA or followed documented solution steps, and the user confirmed the solution was followed and effective, answer 'Yes'.
+    3. If the technician submitted a new KBA or solution article request and noted that it was based on user feedback, answer 'New article submitted'.
+    4. If none of the above conditions are met, or if user confirmation is not clearly mentioned, answer 'Manual audit required'.
+    Key Phrases to Look For (Examples of User Confirmation):
+    “User confirmed issue resolved on its own (i.e., auto-resolved)”
+    “User confirmed/acknowledged the issue is resolved and working as expected”
+
+    q6 - Was a new solution article submitted?
+    1. If the issue was resolved automatically (the user resolved the issue themselves, or it resolved on its own or without manual intervention), answer 'n/a - Existing Article'.
+    2. If the technician referred to or used a KBA or followed the steps from a Solution article to resolve the issue, answer 'n/a - Existing Article'.
+    3. If the resolution describes a new KBA submitted (example- 'KBA -105' or 'KBA -106') or if a new solution article has been uploaded or submitted as part of resolving the issue, answer 'Yes'.
+    4. If none of the above conditions are met, answer 'No'.
+
+    Resolution: {resolution}
+
+    JSON:
+    """
+
+    try:
+        content = invoke_llm(ctx, prompt, "Q-3/Q-5/Q-6")
+    except Exception as e:
+        log_llm_error(ctx, "Q-3/Q-5/Q-6", e)
+        # The per-question fallback is only for malformed answers; it would just hit the same error
+        return {
+            Q3_COLUMN: llm_error_result("Q3", e),
+            Q5_COLUMN: llm_error_result("Q5", e),
+            Q6_COLUMN: llm_error_result("Q6", e),
+        }
+
+    answers = parse_combined_response(content)
+    if answers is None:
+        return None
+
+    results = {
+        Q3_COLUMN: interpret_q3_response(answers["q3"]),
+        Q5_COLUMN: interpret_q5_response(answers["q5"]),
+        Q6_COLUMN: interpret_q6_response(answers["q6"]),
+    }
+    if not resolution or pd.isna(resolution):
+        results[Q6_COLUMN] = ("No", None)  # Same handling of missing resolutions as the Q-6 prompt
+    return results
+
+
+def parse_combined_response(content):
+    # Pull the JSON object out of the answer (models sometimes wrap it in ```json fences)
+    match = re.search(r"\{.*\}", content, re.DOTALL)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    answers = {}
+    for key in ("q3", "q5", "q6"):
+        value = data.get(key)
+        if not isinstance(value, str) or not value.strip():
+            return None
+        answers[key] = value.strip().lower()
+    return answers
+
+
+def check_resolution_separately(ctx, resolution):
+    return {
+        Q3_COLUMN: check_solution_article_with_groq(ctx, resolution),
+        Q5_COLUMN: check_solution_article_with_groq1(ctx, resolution),
+        Q6_COLUMN: check_solution_article_with_groq2(ctx, resolution),
+    }
+
+
+def check_resolution_combined_or_separately(ctx, resolution):
+    # Fall back to the per-question prompts when the combined answer is malformed
+    results = check_resolution_combined(ctx, resolution)
+    if results is None:
+        results = check_resolution_separately(ctx, resolution)
+    return results
+
+
+# LLM-backed columns in the order their notes are appended to the Notes column
+LLM_COLUMNS = [Q2_COLUMN, Q3_COLUMN, Q5_COLUMN, Q6_COLUMN]
+
+
+# Rule fast-path question labels (see rule_prefilter.py) and the audit columns they answer
+RULE_QUESTION_COLUMNS = {"Q-2": Q2_COLUMN, "Q-3": Q3_COLUMN, "Q-5": Q5_COLUMN, "Q-6": Q6_COLUMN}
+
+
+def coalesce_key(value):
+    # Tickets whose task input differs only in whitespace or case get the same answer; the key is a
+    # digest so the run does not keep a copy of every resolution it has seen
+    if pd.isna(value):
+        return None
+    return hashlib.sha256(normalize_text(value).lower().encode("utf-8")).hexdigest()
+
+
+def issue_description_key(row):
+    # The Q-2 prompt only contains the issue description; a missing subject skips the call altogether
+    return coalesce_key(row['Issue Description']), pd.isna(row['Subject'])
+
+
+def resolution_key(row):
+    return coalesce_key(row['Resolution'])
+
+
+# Ticket field each task's prompt is built from
+TASK_FIELDS = {issue_description_key: 'Issue Description', resolution_key: 'Resolution'}
+PROMPT_TOKEN_BUDGETS = {'Issue Description': PROMPT_ISSUE_DESCRIPTION_TOKEN_BUDGET, 'Resolution': PROMPT_RESOLUTION_TOKEN_BUDGET}
+
+
+def compact_rows(ctx, rows):
+    # Copies of rows with their prompt fields compacted, and the (estimated) prompt tokens each
+    # ticket's compacted fields save per call: [{field: tokens}]
+    compacted_rows, savings = [], []
+    for row in rows:
+        compacted_row, saved = row, {}
+        for field, budget in PROMPT_TOKEN_BUDGETS.items():
+            text, truncated = compact_text(row[field], budget)
+            if text is row[field]:
+                continue
+            if compacted_row is row:
+                compacted_row = dict(row)
+            compacted_row[field] = text
+            saved[field] = estimate_tokens(row[field]) - estimate_tokens(text)
+            ctx.count("fields_compacted")
+            ctx.count("fields_truncated", int(truncated))
+        compacted_rows.append(compacted_row)
+        savings.append(saved)
+    return compacted_rows, savings
+
+
+def build_llm_tasks(ctx):
+    # Each task is (columns it answers, function taking a ticket row and returning {column: (verdict, note)},
+    # function returning the row's normalized task input for coalescing)
+    # (for Q-2 the function returns the generated subject, which score_subjects turns into a verdict)
+    tasks = []
+    if ctx.subject_mode != "local":
+        tasks.append(([Q2_COLUMN], lambda row: {Q2_COLUMN: generate_subject_with_model(ctx, row['Issue Description'], row['Subject'])}, issue_description_key))  # Q-2
+    if ctx.resolution_mode == "combined":
+        tasks.append(([Q3_COLUMN, Q5_COLUMN, Q6_COLUMN], lambda row: check_resolution_combined_or_separately(ctx, row['Resolution']), resolution_key))  # Q-3/Q-5/Q-6
+    else:
+        tasks += [
+            ([Q3_COLUMN], lambda row: {Q3_COLUMN: check_solution_article_with_groq(ctx, row['Resolution'])}, resolution_key),    # Q-3
+            ([Q5_COLUMN], lambda row: {Q5_COLUMN: check_solution_article_with_groq1(ctx, row['Resolution'])}, resolution_key),   # Q-5
+            ([Q6_COLUMN], lambda row: {Q6_COLUMN: check_solution_article_with_groq2(ctx, row['Resolution'])}, resolution_key),   # Q-6
+        ]
+    return tasks
+
+
+def task_label(columns):
+    return "/".join(COLUMN_RENAME_MAP[column] for column in columns)
+
+
+def cluster_resolutions(ctx, rows, rule_verdicts):
+    # Representative position per ticket for the Q-3/Q-5/Q-6 tasks (None where the ticket is evaluated on
+    # its own), and (member, representative) position pairs that are evaluated on their own anyway so the
+    # run can report how often a member's verdicts match its representative's
+    resolution_columns = [Q3_COLUMN, Q5_COLUMN, Q6_COLUMN]
+    positions = [
+        position for position, row in enumerate(rows)
+        if pd.notna(row['Resolution']) and str(row['Resolution']).strip() and any(
+            column not in rule_verdicts or pd.isna(rule_verdicts[column][position]) for column in resolution_columns
+        )
+    ]
+    representatives = [None] * len(rows)
+    checks = []
+    if len(positions) < 2:
+        return representatives, checks
+    with ctx.metrics.stage("clustering"):
+        embeddings = encode_texts(ctx, [str(rows[position]['Resolution']) for position in positions]).cpu().numpy()
+        cluster_rows, counts = cluster_representatives(embeddings, ctx.cluster_threshold)
+    ctx.count("resolution_clusters", counts["clusters"])
+    ctx.count("resolution_clusters_low_cohesion", counts["low_cohesion"])
+    for position, representative in zip(positions, cluster_rows):
+        if representative < 0:
+            continue
+        representative = positions[representative]
+        key = resolution_key(rows[position])
+        if key != resolution_key(rows[representative]):
+            # The sample is picked by the resolution's hash, so the same tickets are checked on every run
+            if int(hashlib.sha256(key.encode("utf-8")).hexdigest()[:8], 16) < ctx.cluster_check_rate * 0x100000000:
+                checks.append((position, representative))
+                continue
+            ctx.count("resolutions_clustered")
+        representatives[position] = representative
+    return representatives, checks
+
+
+def checkpoint_key(row, position):
+    # Tickets are checkpointed by RequestID; blank IDs fall back to the row position in the export,
+    # which is stable because a checkpoint only ever resumes the exact same export
+    return str(row['RequestID']) if pd.notna(row['RequestID']) else f"row-{position}"
+
+
+def run_llm_checks(ctx, current_day_df, rule_verdicts=None, progress=None):
+    # Dispatch every LLM task of the run to a bounded thread pool.
+    # Results are stored by position, so the output order never depends on completion order.
+    # rule_verdicts maps a column to per-row verdicts from the rule fast path (None where undecided);
+    # a task is skipped for a ticket when rules already answered every column it covers, when the
+    # ledger holds its verdicts from an earlier run and the ticket is unchanged since, or when a
+    # checkpoint of an earlier, interrupted run of the same export already holds its result.
+    # Tickets with the same normalized task input share one call (see ctx.coalesced).
+    rows = current_day_df.to_dict('records')
+    results = {column: [None] * len(rows) for column in LLM_COLUMNS}
+    tasks = build_llm_tasks(ctx)
+    rule_verdicts = rule_verdicts or {}
+    checkpointing = ctx.checkpoint is not None and ctx.run_key is not None
+    completed = ctx.checkpoint.load(ctx.run_key) if checkpointing else {}
+    # Only tickets with a RequestID go through the ledger; a row position means nothing across exports.
+    # The hash covers the chat backend and model, so switching either re-audits every ticket.
+    model = f"{getattr(ctx.chat, 'backend', 'groq')}/{ctx.chat.model_name}" if ctx.chat is not None else None
+    content_hashes = {
+        str(row['RequestID']): ticket_content_hash(row, model) for row in rows if pd.notna(row['RequestID'])
+    } if ctx.ledger is not None else {}
+    audited = ctx.ledger.lookup(content_hashes) if content_hashes else {}
+    # From here on the tasks see the compacted text; ledger hashes above are of the tickets as exported
+    savings = [{}] * len(rows)
+    if ctx.prompt_compaction:
+        with ctx.metrics.stage("compaction"):
+            rows, savings = compact_rows(ctx, rows)
+    representatives, cluster_checks = [None] * len(rows), []
+    if ctx.resolution_clustering:
+        representatives, cluster_checks = cluster_resolutions(ctx, rows, rule_verdicts)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=ctx.max_workers) as executor:
+        futures = {}  # future -> positions of the tickets waiting on it
+        future_keys = {}  # future -> its ctx.coalesced key
+        shared = []  # ({column: result} answered in an earlier chunk, position)
+        sent = {task_label(columns): [0, 0] for columns, _, _ in tasks}  # tickets, new calls
+        for position, row in enumerate(rows):
+            request_id = checkpoint_key(row, current_day_df.index[position])
+            decided = {
+                column for column, verdicts in rule_verdicts.items() if pd.notna(verdicts[position])
+            }
+            for columns, task, task_key in tasks:
+                if decided.issuperset(columns):
+                    ctx.count("llm_calls_avoided")
+                elif all((request_id, column) in audited for column in columns if column not in decided):
+                    # Only the model's columns are in the ledger; rules answer the others again this run
+                    ctx.count("tasks_unchanged")
+                    for column in columns:
+                        if column not in decided:
+                            results[column][position] = tuple(audited[(request_id, column)])
+                elif all((request_id, column) in completed for column in columns):
+                    ctx.count("tasks_resumed")
+                    for column in columns:
+                        result = completed[(request_id, column)]
+                        results[column][position] = tuple(result) if isinstance(result, list) else result
+                else:
+                    label = task_label(columns)
+                    sent[label][0] += 1
+                    # Members of a resolution cluster send (and share) their representative's task
+                    clustered = task_key is resolution_key and representatives[position] is not None
+                    source = representatives[position] if clustered else position
+                    key = (label, task_key(rows[source])) if ctx.coalesce or clustered else None
+                    future = ctx.coalesced.get(key) if key is not None else None
+                    if isinstance(future, dict):  # Answered earlier in the run
+                        shared.append((future, position))
+                        continue
+                    if future is None:
+                        future = executor.submit(task, rows[source])
+                        ctx.count("prompt_tokens_saved", savings[source].get(TASK_FIELDS[task_key], 0))
+                        sent[label][1] += 1
+                        futures[future] = []
+                        if key is not None:
+                            ctx.coalesced[key] = future
+                            future_keys[future] = key
+                    futures[future].append(position)
+                    continue
+                ctx.question_done(columns)
+        calls = sum(new for _, new in sent.values())
+        ctx.count("llm_calls", calls)
+        ctx.count("llm_calls_coalesced", sum(tickets for tickets, _ in sent.values()) - calls)
+        for label, (tickets, new) in sent.items():
+            ctx.count_coalescing(label, tickets, new)
+
+        def fan_out(task_results, positions):
+            for position in positions:
+                for column, result in task_results.items():
+                    results[column][position] = result
+                ctx.question_done(task_results)
+                # Failed calls are not checkpointed, so a resumed run tries them again
+                if checkpointing:
+                    ctx.checkpoint.save(ctx.run_key, checkpoint_key(rows[position], current_day_df.index[position]), {
+                        column: result for column, result in task_results.items()
+                        if not (isinstance(result, tuple) and result[0] == LLM_ERROR_VERDICT)
+                    })
+
+        # Answers already known from an earlier chunk of the run
+        for task_results, position in shared:
+            fan_out(task_results, [position])
+        for done, future in enumerate(as_completed(futures), start=1):
+            task_results = future.result()
+            fan_out(task_results, futures[future])
+            if future in future_keys:
+                ctx.coalesced[future_keys[future]] = task_results  # Keep the verdicts, not the Future
+            if progress is not None:
+                progress(done, len(futures))
+    ctx.metrics.add_stage("llm_checks", time.perf_counter() - started)
+
+    # Cluster members evaluated on their own: do their verdicts match what the representative would have given them?
+    for position, representative in cluster_checks:
+        verdicts = []
+        for columns, _, task_key in tasks:
+            task_results = ctx.coalesced.get((task_label(columns), resolution_key(rows[representative])))
+            if task_key is not resolution_key or task_results is None:
+                continue
+            for column, result in task_results.items():
+                own = results[column][position]
+                if own is not None and own[0] != LLM_ERROR_VERDICT and result[0] != LLM_ERROR_VERDICT:
+                    verdicts.append(own[0] == result[0])
+        if verdicts:
+            ctx.count("cluster_checks")
+            ctx.count("cluster_checks_agreed", int(all(verdicts)))
+
+    # Q-2 phase 2: batched embedding of the generated subjects, or the local engine for tickets no rule decided
+    issue_descriptions = current_day_df['Issue Description'].tolist()
+    actual_subjects = current_day_df['Subject'].tolist()
+    undecided = [
+        position for position in range(len(rows))
+        if Q2_COLUMN not in rule_verdicts or pd.isna(rule_verdicts[Q2_COLUMN][position])
+    ]
+    if ctx.subject_mode == "local":
+        results[Q2_COLUMN] = score_subjects_locally(ctx, issue_descriptions, actual_subjects, undecided)
+    else:
+        results[Q2_COLUMN] = score_subjects(ctx, issue_descriptions, actual_subjects, results[Q2_COLUMN])
+        if ctx.subject_mode == "compare":
+            count_subject_agreement(
+                ctx, results[Q2_COLUMN], score_subjects_locally(ctx, issue_descriptions, actual_subjects, undecided)
+            )
+
+    # Rule verdicts win over anything the model answered for the same column
+    for column, verdicts in rule_verdicts.items():
+        for position, verdict in enumerate(verdicts):
+            if pd.notna(verdict):
+                results[column][position] = (verdict, None)
+
+    # Remember the model's verdicts for the next run; rule verdicts (and local Q-2 verdicts) are
+    # recomputed every run anyway. Verdicts copied from a cluster representative were never asked for
+    # the ticket itself and stay out, so the ledger only holds answers to the ticket's own resolution.
+    if content_hashes:
+        task_columns = [column for columns, _, _ in tasks for column in columns]
+        cluster_columns = {column for columns, _, task_key in tasks if task_key is resolution_key for column in columns}
+        ctx.ledger.record([
+            (str(row['RequestID']), column, content_hashes[str(row['RequestID'])], results[column][position])
+            for position, row in enumerate(rows) if pd.notna(row['RequestID'])
+            for column in task_columns
+            if (column not in rule_verdicts or pd.isna(rule_verdicts[column][position]))
+            and (column not in cluster_columns or representatives[position] in (None, position))
+            and results[column][position] is not None and results[column][position][0] != LLM_ERROR_VERDICT
+        ])
+    return results
+
+
+def split_llm_results(llm_results, index):
+    # Turn run_llm_checks results into a verdict frame and a note-fragment frame, one column per question
+    verdicts = pd.DataFrame({column: [verdict for verdict, _ in llm_results[column]] for column in LLM_COLUMNS}, index=index)
+    notes = pd.DataFrame({column: [note for _, note in llm_results[column]] for column in LLM_COLUMNS}, index=index)
+    return verdicts, notes
+
+
+def build_notes(existing_notes, note_fragments, q3_verdicts):
+    # Join the template's notes and every question's note fragments in LLM_COLUMNS order in one pass,
+    # then flag tickets whose resolution notes no solution article (Q-3 answered "Manual audit required",
+    # spelled with either case depending on the path that answered it)
+    notes = existing_notes.fillna("").astype(str).str.cat(
+        [note_fragments[column] for column in LLM_COLUMNS], na_rep=""
+    )
+    kba_missing = q3_verdicts.fillna("").astype(str).str.lower() == "manual audit required"
+    return notes.mask(kba_missing, np.where(notes != "", notes + ", KBA is missing", "KBA is missing"))
+
+
+# Mapping long questions to short labels
+COLUMN_RENAME_MAP = {
+    Q1_COLUMN: 'Q-1',
+    Q2_COLUMN: 'Q-2',
+    Q3_COLUMN: 'Q-3',
+    Q4_COLUMN: 'Q-4',
+    Q5_COLUMN: 'Q-5',
+    Q6_COLUMN: 'Q-6'
+}
+
+
+def request_id_keys(request_ids):
+    # Join key for Request IDs: the ID as text, so IDs read as numbers in one workbook and as text in
+    # the other still match; blank IDs stay NaN and match nothing
+    return request_ids.where(request_ids.isna(), request_ids.astype(str))
+
+
+def index_template(audit_df):
+    # Template rows that can be matched to export tickets, one per Request ID (the last one wins)
+    template = audit_df.assign(**{'Request ID': request_id_keys(audit_df['Request ID'])})
+    return template.dropna(subset=['Request ID']).drop_duplicates('Request ID', keep='last')
+
+
+def audited_tickets(report_df, export_df):
+    # Export tickets joined on Request ID with the verdicts an audited report recorded for them, as
+    # columns Q-1..Q-6 whichever headers the report uses; for calibrating and training the local checks
+    report = index_template(report_df.rename(columns=COLUMN_RENAME_MAP))
+    questions = [label for label in COLUMN_RENAME_MAP.values() if label in report.columns]
+    export = export_df.assign(**{'Request ID': request_id_keys(export_df['RequestID'])})
+    return pd.merge(export, report[['Request ID'] + questions], on='Request ID', how='inner')
+
+
+def manual_answers(audit_df, column):
+    # Answers already filled in on the template (e.g. by an auditor); NaN where the cell is empty
+    answers = audit_df[column]
+    return answers.where(answers.notna() & (answers.astype(str).str.strip() != ''))
+
+
+def classify_resolutions(ctx, current_day_df, rule_verdicts):
+    # {column: [(verdict, note) or None per row]} for the questions the verdict classifier answers
+    # confidently; tickets without a resolution, or already decided by a rule, are left alone
+    resolutions = current_day_df['Resolution']
+    positions = [
+        position for position, resolution in enumerate(resolutions.tolist())
+        if pd.notna(resolution) and str(resolution).strip()
+    ]
+    if not positions:
+        return {}
+    embeddings = encode_texts(ctx, [str(resolutions.iloc[position]) for position in positions]).cpu().numpy()
+    preset = {}
+    for question, predictions in ctx.verdict_classifier.predict(embeddings).items():
+        column = RULE_QUESTION_COLUMNS[question]
+        rules = rule_verdicts.get(column, [None] * len(current_day_df))
+        entries = [None] * len(current_day_df)
+        for position, prediction in zip(positions, predictions):
+            if pd.isna(rules[position]):
+                entries[position] = prediction
+        preset[column] = entries
+    return preset
+
+
+def audit_chunk(ctx, current_day_df, template, progress=None):
+    # Audit a batch of tickets from the technician export and return their report rows (Q-1..Q-6
+    # headers). template is the audit template from index_template: tickets are matched to its rows on
+    # Request ID, and answers already present there are kept instead of being re-evaluated.
+    # progress(done, total) is called as LLM calls complete.
+    audit_df = pd.merge(
+        pd.DataFrame({'Request ID': request_id_keys(current_day_df['RequestID'])}), template,
+        how='left', on='Request ID', validate='many_to_one',
+    )[template.columns]
+    audit_df.index = current_day_df.index
+
+    # Update Service_Desk_Incident_Management_Ticket_Audits with the relevant data from Current_day_by_Technician
+    audit_df['Technician'] = current_day_df['Technician']
+    audit_df['Request ID'] = current_day_df['RequestID']
+    audit_df['Subject'] = current_day_df['Subject']
+    audit_df['Completed Date'] = current_day_df['Resolved Time']
+
+    # Set the Manager column to "Saravanan"
+    audit_df['Manager'] = audit_df['Manager'].fillna('')
+
+    #Q1
+    # Update the "Has the 'Requester Name' been updated to reflect who the ticket is for?" column based on 'Requester' and 'On Behalf Of User'
+    q1_answers = manual_answers(audit_df, Q1_COLUMN)
+    with ctx.metrics.stage("Q-1"):
+        audit_df[Q1_COLUMN] = q1_answers.where(q1_answers.notna(), check_requester_name(current_day_df))
+
+    # Rule fast path first, evaluated column-wise over the whole batch
+    rule_verdicts = {}
+    if ctx.rules:
+        with ctx.metrics.stage("rules"):
+            rule_df = apply_rules(current_day_df, ctx.rules)
+        rule_verdicts = {RULE_QUESTION_COLUMNS[question]: rule_df[question].tolist() for question in rule_df.columns}
+        if ctx.subject_mode == "local":
+            # The local Q-2 engine runs the same format check and also scores the subject's relevance
+            rule_verdicts.pop(Q2_COLUMN, None)
+
+    # Verdicts decided before the LLM runs that carry their own note, per column: (verdict, note) or None
+    # per row. Like a rule verdict they spare the model call; unlike one they keep their note in the report.
+    preset = {}
+
+    # Subject prefixes that are not a cataloged service need a manual look, whatever the subject's shape
+    if ctx.service_catalog is not None:
+        with ctx.metrics.stage("rules"):
+            preset[Q2_COLUMN] = ctx.service_catalog.flags(current_day_df['Subject'])
+
+    # Q-3/Q-5/Q-6 the classifier trained on earlier audits is confident about, for tickets no rule decided
+    if ctx.verdict_classifier is not None:
+        with ctx.metrics.stage("classifier"):
+            preset.update(classify_resolutions(ctx, current_day_df, rule_verdicts))
+
+    for column, entries in preset.items():
+        rules = rule_verdicts.get(column, [None] * len(entries))
+        rule_verdicts[column] = [entry[0] if entry else rule for entry, rule in zip(entries, rules)]
+
+    # Answers from the template take precedence over rules and spare the LLM call like a rule verdict
+    for column in LLM_COLUMNS:
+        answers = manual_answers(audit_df, column)
+        if answers.notna().any():
+            rule_answers = rule_verdicts.get(column, [None] * len(answers))
+            rule_verdicts[column] = [
+                answer if pd.notna(answer) else rule for answer, rule in zip(answers.tolist(), rule_answers)
+            ]
+    q4_answers = manual_answers(audit_df, Q4_COLUMN)
+
+    # Q-2, Q-3, Q-5 and Q-6 all go through the concurrent LLM engine
+    llm_results = run_llm_checks(ctx, current_day_df, rule_verdicts, progress)
+    for column, entries in preset.items():
+        answers = manual_answers(audit_df, column).tolist()
+        for position, entry in enumerate(entries):
+            if entry is not None and pd.isna(answers[position]):
+                llm_results[column][position] = entry  # With its note
+                ctx.count("services_flagged" if column == Q2_COLUMN else "classifier_answers")
+
+    # Write verdicts back by position; note fragments stay in their own columns until joined once
+    llm_verdicts, note_fragments = split_llm_results(llm_results, current_day_df.index)
+    for column in LLM_COLUMNS:
+        audit_df[column] = llm_verdicts[column]
+
+    # Notes in question order (Q-2, Q-3, Q-5), plus "KBA is missing" where Q-3 found no solution article
+    audit_df['Notes'] = build_notes(audit_df['Notes'], note_fragments, audit_df[Q3_COLUMN])
+
+    ctx.count("tickets", len(current_day_df))
+    ctx.count("llm_errors", int((llm_verdicts == LLM_ERROR_VERDICT).sum().sum()))
+
+    # Reuse the result from Section 8b for Section 9
+    audit_df.rename(columns=COLUMN_RENAME_MAP, inplace=True)
+    audit_df["Q-4"] = q4_answers.where(q4_answers.notna(), audit_df["Q-3"])
+    return audit_df
+
+
+def iter_audit(ctx, chunks, audit_df, progress=None):
+    # Audit an export given as DataFrame chunks (see export_reader.iter_export_chunks) against the
+    # audit template, yielding each chunk's report rows as soon as they are ready, so the whole export
+    # never has to be in memory. Template rows for tickets that are not in the export come last.
+    template = index_template(audit_df)
+    audited_ids = set()
+    chunks = iter(chunks)
+    while True:
+        # Parsing the export happens lazily inside the chunk iterator, so it is timed here
+        with ctx.metrics.stage("excel_load"):
+            current_day_df = next(chunks, None)
+        if current_day_df is None:
+            break
+        if not current_day_df.empty:
+            audited_ids.update(request_id_keys(current_day_df['RequestID']).dropna())
+            yield audit_chunk(ctx, current_day_df, template, progress)
+
+    not_in_export = template[~template['Request ID'].isin(audited_ids)]
+    if not not_in_export.empty:
+        yield not_in_export.rename(columns=COLUMN_RENAME_MAP)
+
+    # The run finished, so its checkpoint is no longer needed. With LLM errors it is kept: running the
+    # same export again only retries the failed tasks.
+    if ctx.checkpoint is not None and ctx.run_key is not None and not ctx.stats["llm_errors"]:
+        ctx.checkpoint.clear(ctx.run_key)
+
+
+def run_audit(ctx, current_day_df, audit_df, progress=None):
+    # Audit a whole export held in one frame. Returns the report frame and the run's statistics.
+    frames = list(iter_audit(ctx, [current_day_df], audit_df, progress))
+    report = pd.concat(frames) if frames else audit_df.rename(columns=COLUMN_RENAME_MAP)
+    return report, dict(ctx.stats)
+
+
+def write_report(audit_df, output):
+    # output is a file path or a binary buffer. Reports audited chunk by chunk are better written with
+    # a ReportWriter directly, one write() per chunk from iter_audit.
+    with ReportWriter(output) as writer:
+        writer.write(audit_df)
@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import pandas as pd
+
+import audit_engine
+from audit_metrics import AUDIT_METRICS_ENABLED, RunMetrics, write_run_metrics
+from export_reader import count_export_rows, iter_export_chunks
+from report_writer import ReportWriter
+
+# Background audit jobs for the Streamlit server. A job runs on a small worker pool in the server
+# process, so a long audit neither blocks the page that started it nor dies when the auditor
+# navigates away; pages poll the job by its ID and download the finished workbook whenever they like.
+# Jobs of several auditors run side by side and share the throttled chat client, so together they
+# still stay under the Groq quota.
+
+# Audits running at the same time (each one still uses up to its own max concurrency of LLM calls)
+AUDIT_JOB_WORKERS = int(os.getenv("AUDIT_JOB_WORKERS", "2"))
+# Finished jobs (and their reports) are dropped from memory after this many hours
+AUDIT_JOB_RETENTION_HOURS = float(os.getenv("AUDIT_JOB_RETENTION_HOURS", "24"))
+
+
+class AuditJob:
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex[:8]
+        self.name = name
+        self.status = "queued"  # queued -> running -> done | failed
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Filled in by the job function as the audit runs
+        self.ctx = None
+        self.tickets_total = None
+        self.report = None
+        self.report_df = None
+        self.sidecar = None
+        self.sidecar_format = None
+        self.stats = None
+        self.metrics = None
+        self.details = {}
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+
+class AuditJobQueue:
+    def __init__(self, max_workers=AUDIT_JOB_WORKERS, retention_hours=AUDIT_JOB_RETENTION_HOURS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="audit-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self.retention_seconds = retention_hours * 60 * 60
+
+    def submit(self, name, fn, *args, **kwargs):
+        # Queue fn(job, *args, **kwargs) and return the job right away
+        job = AuditJob(name)
+        with self._lock:
+            self._expire()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            fn(job, *args, **kwargs)
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, job_ids):
+        # The given jobs that still exist, most recent first
+        with self._lock:
+            found = [self._jobs[job_id] for job_id in job_ids if job_id in self._jobs]
+        return sorted(found, key=lambda job: job.submitted_at, reverse=True)
+
+    def _expire(self):
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+
+def run_audit_job(job, ctx, export, template_path, sidecar_format=None):
+    # Job function for AuditJobQueue.submit: audit the export (the uploaded file's bytes) chunk by
+    # chunk, writing the report workbook (and sidecar) into the job as it goes
+    job.ctx = ctx
+    ctx.metrics = RunMetrics()  # Time the run from when the job starts, not from when it was queued
+    job.tickets_total = count_export_rows(BytesIO(export))
+    with ctx.metrics.stage("excel_load"):
+        audit_df = pd.read_excel(template_path)
+
+    output = BytesIO()
+    sidecar_output = BytesIO() if sidecar_format else None
+    frames = []
+    writer = ReportWriter(output, sidecar_format, sidecar_output)
+    for report_chunk in audit_engine.iter_audit(ctx, iter_export_chunks(BytesIO(export)), audit_df):
+        with ctx.metrics.stage("excel_write"):
+            writer.write(report_chunk)
+        frames.append(report_chunk)
+    with ctx.metrics.stage("excel_write"):
+        writer.close()
+
+    job.report = output.getvalue()
+    job.report_df = pd.concat(frames) if frames else None
+    job.sidecar = sidecar_output.getvalue() if sidecar_output is not None else None
+    job.sidecar_format = sidecar_format
+    job.stats = dict(ctx.stats)
+    job.metrics = ctx.summary(export=job.name, job_id=job.id)
+    if AUDIT_METRICS_ENABLED:
+        write_run_metrics(job.metrics)
@@ -0,0 +1,67 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+# Ticket fields an audit verdict depends on. A ticket whose fields are unchanged since it was last
+# audited keeps its stored verdicts; any edit (a re-opened ticket with a new resolution, a corrected
+# subject) sends it through the model again.
+LEDGER_FIELDS = ['Subject', 'Issue Description', 'Resolution', 'Requester', 'On Behalf Of User']
+
+
+def ticket_content_hash(row, model=None):
+    # model identifies the chat backend and model the verdicts come from ("groq/llama-3.3-70b-versatile");
+    # verdicts of another model do not count as audited
+    values = ["" if pd.isna(row.get(field)) else str(row.get(field)).strip() for field in LEDGER_FIELDS]
+    return hashlib.sha256(json.dumps([model] + values, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+# Persistent record of every ticket's model verdicts across runs, keyed by (RequestID, question
+# column) and tagged with the content hash they were computed from. Daily exports overlap heavily,
+# so a run only asks the model about tickets that are new or changed since they were last audited.
+class AuditLedger:
+    def __init__(self, cache_dir=".cache"):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "audit_ledger.sqlite")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            " request_id TEXT NOT NULL, question TEXT NOT NULL, content_hash TEXT NOT NULL,"
+            " result TEXT NOT NULL, audited_at REAL NOT NULL,"
+            " PRIMARY KEY (request_id, question))"
+        )
+        self._conn.commit()
+
+    def lookup(self, content_hashes):
+        # content_hashes is {request_id: content_hash}; returns {(request_id, question): result} for
+        # the stored verdicts whose ticket content is unchanged
+        request_ids = list(content_hashes)
+        found = {}
+        with self._lock:
+            for start in range(0, len(request_ids), 500):  # stay below SQLite's bound-parameter limit
+                chunk = request_ids[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT request_id, question, content_hash, result FROM verdicts"
+                    f" WHERE request_id IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for request_id, question, content_hash, result in rows:
+                    if content_hashes[request_id] == content_hash:
+                        found[(request_id, question)] = json.loads(result)
+        return found
+
+    def record(self, entries):
+        # entries is a list of (request_id, question, content_hash, result)
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO verdicts (request_id, question, content_hash, result, audited_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [(request_id, question, content_hash, json.dumps(result), now)
+                 for request_id, question, content_hash, result in entries],
+            )
+            self._conn.commit()
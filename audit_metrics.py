@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Timing and LLM usage of one audit run. Stages (Excel load, Q-1, rules, classifier, LLM checks,
+# embeddings, Excel write) are wall-clock seconds; every model call is recorded with its question,
+# latency and the prompt / completion tokens reported in the response metadata, and every embedding
+# lookup (Q-2 strings, resolutions) with where its vector came from (memory, disk or the
+# model). summary() condenses them into one record per run, appended to a JSONL file so latency
+# percentiles and cost per ticket can be compared across days.
+
+AUDIT_METRICS_ENABLED = os.getenv("AUDIT_METRICS_ENABLED", "true").lower() == "true"
+AUDIT_METRICS_PATH = os.getenv("AUDIT_METRICS_PATH", os.path.join(".cache", "audit_metrics.jsonl"))
+# USD per million tokens, for the cost estimate (defaults: Groq list price of llama-3.3-70b-versatile)
+PRICE_PER_MILLION_PROMPT_TOKENS = float(os.getenv("GROQ_PRICE_PER_MILLION_INPUT", "0.59"))
+PRICE_PER_MILLION_COMPLETION_TOKENS = float(os.getenv("GROQ_PRICE_PER_MILLION_OUTPUT", "0.79"))
+
+
+def token_usage(response):
+    # (prompt_tokens, completion_tokens) of a LangChain chat response; zeros when the backend reports none
+    usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    if usage:
+        return usage.get("prompt_tokens") or 0, usage.get("completion_tokens") or 0
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("input_tokens") or 0, usage.get("output_tokens") or 0
+
+
+def latency_summary(latencies):
+    if not latencies:
+        return {"latency_p50": None, "latency_p95": None, "latency_max": None}
+    p50, p95 = np.percentile(latencies, [50, 95])
+    return {"latency_p50": round(float(p50), 3), "latency_p95": round(float(p95), 3),
+            "latency_max": round(max(latencies), 3)}
+
+
+class RunMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.calls = []  # (question, latency seconds, prompt tokens, completion tokens, failed)
+        self.embeddings = {"texts": 0, "memory_hits": 0, "disk_hits": 0, "encoded": 0}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        # Time a block; repeated blocks of the same stage (one per chunk) add up
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - started)
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def record_call(self, question, latency, prompt_tokens=0, completion_tokens=0, failed=False):
+        with self._lock:
+            self.calls.append((question or "other", latency, prompt_tokens, completion_tokens, failed))
+
+    def record_embeddings(self, texts, memory_hits=0, disk_hits=0, encoded=0):
+        with self._lock:
+            self.embeddings["texts"] += texts
+            self.embeddings["memory_hits"] += memory_hits
+            self.embeddings["disk_hits"] += disk_hits
+            self.embeddings["encoded"] += encoded
+
+    def summary(self, tickets, priced=True, **fields):
+        # priced=False for backends on our own hardware, which cost nothing per token
+        with self._lock:
+            calls = list(self.calls)
+            stages = dict(self.stages)
+            embeddings = dict(self.embeddings)
+        prompt_tokens = sum(call[2] for call in calls)
+        completion_tokens = sum(call[3] for call in calls)
+        cost = (prompt_tokens * PRICE_PER_MILLION_PROMPT_TOKENS
+                + completion_tokens * PRICE_PER_MILLION_COMPLETION_TOKENS) / 1_000_000 if priced else 0.0
+        wall_seconds = time.perf_counter() - self.started
+
+        questions = {}
+        for question in sorted({call[0] for call in calls}):
+            question_calls = [call for call in calls if call[0] == question]
+            questions[question] = {
+                "calls": len(question_calls),
+                "failed": sum(1 for call in question_calls if call[4]),
+                "seconds": round(sum(call[1] for call in question_calls), 3),
+                "prompt_tokens": sum(call[2] for call in question_calls),
+                "completion_tokens": sum(call[3] for call in question_calls),
+                **latency_summary([call[1] for call in question_calls if not call[4]]),
+            }
+
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            **fields,
+            "tickets": tickets,
+            "wall_seconds": round(wall_seconds, 3),
+            "tickets_per_second": round(tickets / wall_seconds, 2) if wall_seconds else None,
+            "stages": {name: round(seconds, 3) for name, seconds in stages.items()},
+            "llm": {
+                "calls": len(calls),
+                "failed": sum(1 for call in calls if call[4]),
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "tokens_per_ticket": round((prompt_tokens + completion_tokens) / tickets, 1) if tickets else None,
+                "tokens_per_second": round((prompt_tokens + completion_tokens) / wall_seconds, 1) if wall_seconds else None,
+                "cost_usd": round(cost, 6),
+                "cost_per_ticket_usd": round(cost / tickets, 8) if tickets else None,
+                **latency_summary([call[1] for call in calls if not call[4]]),
+            },
+            # Cumulative model time per question (calls overlap, so these add up to more than the wall time)
+            "questions": questions,
+            # Share of the embedded strings that skipped the model's forward pass (cache hits and repeats in a batch)
+            "embeddings": {
+                **embeddings,
+                "hit_rate": round(1 - embeddings["encoded"] / embeddings["texts"], 3) if embeddings["texts"] else None,
+            },
+        }
+
+
+def write_run_metrics(summary, path=AUDIT_METRICS_PATH):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(summary, ensure_ascii=False, default=str) + "\n")
+
+
+def summary_line(summary):
+    # One-line rendering of a summary() record, for logs and the command line
+    llm = summary["llm"]
+    latency = "n/a" if llm["latency_p50"] is None else f"p50 {llm['latency_p50']:.2f}s, p95 {llm['latency_p95']:.2f}s"
+    stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in summary["stages"].items())
+    embeddings = summary["embeddings"]
+    cached = "" if embeddings["hit_rate"] is None else (
+        f"; {embeddings['encoded']} of {embeddings['texts']} strings encoded ({embeddings['hit_rate']:.0%} cached)")
+    backend = f"{summary['llm_backend']} " if summary.get("llm_backend") else ""
+    unique = ", ".join(
+        f"{label} {counts['unique']}/{counts['tickets']}" for label, counts in (summary.get("coalescing") or {}).items()
+        if counts["tickets"]
+    )
+    unique = f"; unique inputs {unique}" if unique else ""
+    saved = (summary.get("stats") or {}).get("prompt_tokens_saved")
+    compacted = f"; ~{saved} prompt tokens saved by compaction" if saved else ""
+    return (f"{stages}; {summary['tickets_per_second']} tickets/s; {llm['calls']} {backend}LLM calls ({latency}), "
+            f"{llm['prompt_tokens']} prompt + {llm['completion_tokens']} completion tokens, ~${llm['cost_usd']:.4f}"
+            f"{cached}{unique}{compacted}")
@@ -0,0 +1,125 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+
+import numpy as np
+from cachetools import LRUCache
+
+
+# Persistent store of the Q-2 sentence embeddings. Recurring subjects ("PASSWORD - Reset") and the
+# identical headers the model generates for similar tickets are encoded once and read back on every
+# later run instead of going through the MiniLM forward pass again. Vectors are appended to a float32
+# file that is read through np.memmap; a SQLite index maps the hash of the model name and normalized
+# text to the vector's row. An LRU-bounded dict in memory sits in front of both.
+def normalize_text(text):
+    # Whitespace and Unicode form do not change the meaning of a subject, so they do not change the key
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", str(text))).strip()
+
+
+class EmbeddingCache:
+    def __init__(self, model_name, cache_dir=".cache", memory_entries=10000):
+        directory = os.path.join(cache_dir, "embeddings")
+        os.makedirs(directory, exist_ok=True)
+        # One matrix per model: vectors of different models neither mix nor share a dimension
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.model_name = model_name
+        self.vectors_path = os.path.join(directory, slug + ".f32")
+        self._memory = LRUCache(maxsize=memory_entries)
+        self._matrix = None  # memmap of the rows on disk, reopened once the file has grown
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, slug + ".sqlite"), check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.commit()
+        self.dimensions = None
+        self._load_dimensions()
+
+    def _load_dimensions(self):
+        # Another instance or process may have written the first vectors since this one opened an empty store
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'dimensions'").fetchone()
+        if row:
+            self.dimensions = int(row[0])
+
+    def make_key(self, text):
+        payload = f"{self.model_name}\n{normalize_text(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def encode(self, model, texts, batch_size=32):
+        # Vectors of texts (float32, one row per text) and where they came from: {"texts", "memory_hits",
+        # "disk_hits", "encoded"}, counted per distinct string; repeats within texts are encoded once
+        keys = [self.make_key(text) for text in texts]
+        distinct = dict(zip(keys, texts))
+        with self._lock:
+            found = {key: self._memory[key] for key in distinct if key in self._memory}
+            memory_hits = len(found)
+            from_disk = self._read(self._lookup([key for key in distinct if key not in found]))
+            found.update(from_disk)
+            for key, vector in from_disk.items():
+                self._memory[key] = vector
+
+        missing = [key for key in distinct if key not in found]
+        if missing:
+            vectors = np.asarray(
+                model.encode([distinct[key] for key in missing], batch_size=batch_size, convert_to_numpy=True),
+                dtype=np.float32,
+            )
+            with self._lock:
+                self._append(dict(zip(missing, vectors)))
+                for key, vector in zip(missing, vectors):
+                    self._memory[key] = vector
+                    found[key] = vector
+
+        counts = {"texts": len(texts), "memory_hits": memory_hits, "disk_hits": len(from_disk), "encoded": len(missing)}
+        if not keys:
+            return np.zeros((0, self.dimensions or 0), dtype=np.float32), counts
+        return np.stack([found[key] for key in keys]), counts
+
+    def _lookup(self, keys):
+        rows = {}
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows.update(self._conn.execute(
+                f"SELECT key, row FROM vectors WHERE key IN ({placeholders})", batch
+            ).fetchall())
+        return rows
+
+    def _read(self, rows):
+        if not rows:
+            return {}
+        needed = max(rows.values()) + 1
+        if self.dimensions is None:
+            self._load_dimensions()
+        if self._matrix is None or len(self._matrix) < needed:
+            count = os.path.getsize(self.vectors_path) // (self.dimensions * 4)
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(count, self.dimensions))
+        keys = list(rows)
+        vectors = np.array(self._matrix[[rows[key] for key in keys]])  # Copy out of the mapping
+        return dict(zip(keys, vectors))
+
+    def _append(self, vectors):
+        # BEGIN IMMEDIATE holds the SQLite write lock while the file is appended to, so processes
+        # sharing the cache directory (the Streamlit server and a scheduled CLI run) never claim the same rows
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self.dimensions is None:
+                self._load_dimensions()
+            if self.dimensions is None:
+                self.dimensions = len(next(iter(vectors.values())))
+                self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('dimensions', ?)",
+                                   (str(self.dimensions),))
+            with open(self.vectors_path, "ab") as f:
+                f.seek(0, os.SEEK_END)
+                start = f.tell() // (self.dimensions * 4)
+                f.write(np.stack(list(vectors.values())).astype(np.float32).tobytes())
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (key, row) VALUES (?, ?)",
+                [(key, start + offset) for offset, key in enumerate(vectors)],
+            )
+            self._conn.commit()
+        except Exception:
+            self._conn.rollback()
+            raise
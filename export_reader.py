@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Streaming reader for the Current_day_by_Technician export. pd.read_excel builds openpyxl's full
+# object model of the workbook and a frame of every column before any work starts; here the sheet is
+# parsed in read-only mode and only the columns the audit uses are kept, handed on in fixed-size
+# chunks, so memory stays bounded by the chunk size rather than the export size.
+
+# Export columns the audit reads; everything else in the export is skipped while parsing
+EXPORT_COLUMNS = [
+    'RequestID', 'Technician', 'Subject', 'Resolved Time', 'Request Mode',
+    'Requester', 'On Behalf Of User', 'Issue Description', 'Resolution',
+]
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+
+
+def iter_export_chunks(source, chunk_size=EXPORT_CHUNK_SIZE, columns=EXPORT_COLUMNS):
+    # source is a path or a binary file object (e.g. a Streamlit upload). Yields DataFrames of up to
+    # chunk_size tickets, indexed by their row position in the export like pd.read_excel would.
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        positions = {str(name).strip(): i for i, name in enumerate(header) if name is not None}
+        missing = [column for column in columns if column not in positions]
+        if missing:
+            raise ValueError(f"Export is missing required columns: {', '.join(missing)}")
+        wanted = [positions[column] for column in columns]
+
+        start, chunk = 0, []
+        for row in rows:
+            if not any(row):
+                continue  # Trailing blank rows Excel sometimes keeps in the sheet dimensions
+            # Empty cells come back as None; use NaN like pd.read_excel so the checks treat them the same way
+            chunk.append([np.nan if i >= len(row) or row[i] is None else row[i] for i in wanted])
+            if len(chunk) == chunk_size:
+                yield _chunk_frame(chunk, columns, start)
+                start, chunk = start + len(chunk), []
+        if chunk:
+            yield _chunk_frame(chunk, columns, start)
+    finally:
+        workbook.close()
+
+
+def _chunk_frame(chunk, columns, start):
+    return pd.DataFrame(chunk, columns=columns, index=pd.RangeIndex(start, start + len(chunk)))
+
+
+def read_export(source, chunk_size=EXPORT_CHUNK_SIZE):
+    # The whole export (needed columns only) as one frame
+    frames = list(iter_export_chunks(source, chunk_size))
+    return pd.concat(frames) if frames else pd.DataFrame(columns=EXPORT_COLUMNS)
+
+
+def count_export_rows(source):
+    # Ticket count from the sheet dimensions, without parsing the rows (for progress displays). It can
+    # overcount when Excel kept trailing blank rows, and is None when the file records no dimensions.
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(source, read_only=True)
+    try:
+        max_row = workbook.active.max_row
+    finally:
+        workbook.close()
+    return None if max_row is None else max(0, max_row - 1)
@@ -0,0 +1,114 @@
+import threading
+
+# Chat model backends the audit checks can run on, selected per run:
+#
+#   groq          ChatGroq against the Groq API (the default), throttled to our Groq quota
+#   openai        any OpenAI-compatible /chat/completions server on our own hardware, e.g. llama.cpp's
+#                 llama-server or vLLM
+#   transformers  a small instruction-tuned model run inside this process with Hugging Face transformers
+#
+# Every backend looks like ChatGroq to the audit engine: invoke(messages), model_name and temperature,
+# returning a response with .content and the token usage in response_metadata. The response cache,
+# RateLimitedChat's retries and the run metrics (latency percentiles, tokens, tickets per second)
+# therefore work the same for all of them, and runs on different backends can be compared directly.
+
+LLM_BACKENDS = ["groq", "openai", "transformers"]
+
+
+class ChatResponse:
+    def __init__(self, content, prompt_tokens=0, completion_tokens=0, model_name=None):
+        self.content = content
+        self.response_metadata = {
+            "token_usage": {
+                "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+            "model_name": model_name,
+        }
+
+
+class BackendHTTPError(Exception):
+    # Carries status_code and response like the Groq SDK's errors, so RateLimitedChat can tell
+    # retryable failures apart and honour Retry-After
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status_code}: {response.text[:200]}")
+        self.status_code = response.status_code
+        self.response = response
+
+
+def prompt_text(messages):
+    return "".join(message if isinstance(message, str) else message.content for message in messages)
+
+
+class OpenAICompatibleChat:
+    backend = "openai"
+
+    def __init__(self, base_url, model_name, temperature=0, api_key=None, timeout=120.0, max_tokens=None):
+        import httpx
+
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        # One client (and connection pool) shared by all worker threads
+        self._client = httpx.Client(base_url=base_url.rstrip("/"), headers=headers, timeout=timeout)
+        self.model_name = model_name
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+
+    def invoke(self, messages):
+        body = {
+            "model": self.model_name,
+            "temperature": self.temperature,
+            "messages": [{"role": "user", "content": prompt_text(messages)}],
+        }
+        if self.max_tokens:
+            body["max_tokens"] = self.max_tokens
+        response = self._client.post("/chat/completions", json=body)
+        if response.status_code >= 400:
+            raise BackendHTTPError(response)
+        data = response.json()
+        usage = data.get("usage") or {}
+        return ChatResponse(
+            data["choices"][0]["message"].get("content") or "",
+            usage.get("prompt_tokens") or 0, usage.get("completion_tokens") or 0, data.get("model"),
+        )
+
+
+class TransformersChat:
+    backend = "transformers"
+
+    def __init__(self, model_name, temperature=0, max_new_tokens=128, threads=None):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModelForCausalLM.from_pretrained(model_name)
+        self.model.eval()
+        self.model_name = model_name
+        self.temperature = temperature
+        self.max_new_tokens = max_new_tokens
+        # generate() already uses every CPU thread; concurrent calls would only contend for them
+        self._lock = threading.Lock()
+
+    def invoke(self, messages):
+        import torch
+
+        text = prompt_text(messages)
+        if self.tokenizer.chat_template:
+            inputs = self.tokenizer.apply_chat_template(
+                [{"role": "user", "content": text}], add_generation_prompt=True, return_tensors="pt", return_dict=True
+            )
+        else:
+            inputs = self.tokenizer(text, return_tensors="pt")
+        sampling = {"do_sample": True, "temperature": self.temperature} if self.temperature else {"do_sample": False}
+        with self._lock, torch.no_grad():
+            output = self.model.generate(
+                **inputs, max_new_tokens=self.max_new_tokens,
+                pad_token_id=self.tokenizer.pad_token_id or self.tokenizer.eos_token_id, **sampling,
+            )
+        prompt_tokens = inputs["input_ids"].shape[1]
+        completion = output[0, prompt_tokens:]
+        return ChatResponse(
+            self.tokenizer.decode(completion, skip_special_tokens=True).strip(),
+            int(prompt_tokens), int(completion.shape[0]), self.model_name,
+        )
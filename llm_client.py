@@ -0,0 +1,137 @@
+import random
+import threading
+import time
+
+# Client-side throttling and retries for the chat model shared by all audit checks.
+#
+# Requests and tokens per minute each go through a token bucket sized to the Groq quota, so the
+# thread pool cannot burst past it. Retryable failures (429, 5xx, timeouts, connection errors) are
+# retried with exponential backoff and full jitter; a 429 also halves the request rate for a while.
+# When the retries run out, or the error is not retryable, LLMError is raised so the caller can
+# report "LLM error" instead of inventing a verdict. Backends on our own hardware have no quota, so
+# the buckets can be left out (requests_per_minute / tokens_per_minute None) and only the retries apply.
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = {"APITimeoutError", "APIConnectionError", "Timeout", "ConnectError", "ReadTimeout"}
+
+
+class LLMError(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0  # refill per second
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1.0):
+        # Block until `amount` can be taken (requests larger than the capacity wait for a full bucket)
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def debit(self, amount):
+        # Charge a correction after the fact (e.g. actual token usage above the estimate); may go negative
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+
+
+def is_retryable(error):
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code in RETRYABLE_STATUS_CODES or type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+
+def retry_after_seconds(error):
+    # Honour a Retry-After header when the server sent one
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(text):
+    # Rough prompt size for the token bucket (about 4 characters per token); corrected from usage later
+    return max(1, len(text) // 4)
+
+
+class RateLimitedChat:
+    # Wraps a LangChain chat model or an llm_backends chat; exposes invoke(), model_name, temperature and backend
+    def __init__(self, chat, requests_per_minute=30, tokens_per_minute=12000, max_retries=5,
+                 base_delay=1.0, max_delay=60.0, completion_tokens=64):
+        self.chat = chat
+        self.model_name = chat.model_name
+        self.temperature = chat.temperature
+        self.backend = getattr(chat, "backend", "groq")
+        self.requests_per_minute = requests_per_minute
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.completion_tokens = completion_tokens  # expected answer size added to each estimate
+        self.retries = 0
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, messages):
+        prompt_text = "".join(message if isinstance(message, str) else message.content for message in messages)
+        estimate = estimate_tokens(prompt_text) + self.completion_tokens
+
+        for attempt in range(self.max_retries + 1):
+            if self.request_bucket is not None:
+                self.request_bucket.acquire()
+            if self.token_bucket is not None:
+                self.token_bucket.acquire(estimate)
+            try:
+                response = self.chat.invoke(messages)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise LLMError(f"{type(e).__name__}: {e}") from e
+                if attempt == self.max_retries:
+                    raise LLMError(f"gave up after {attempt + 1} attempts: {type(e).__name__}: {e}") from e
+                self._backoff(e, attempt)
+                continue
+
+            self._on_success(response, estimate)
+            return response
+
+    def _backoff(self, error, attempt):
+        with self._lock:
+            self.retries += 1
+            if getattr(error, "status_code", None) == 429:
+                self.rate_limited += 1
+                if self.request_bucket is not None:
+                    # Multiplicative decrease of the request rate; _on_success creeps it back up
+                    self.request_bucket.rate = max(self.request_bucket.rate / 2, 1 / 60.0)
+        delay = retry_after_seconds(error)
+        if delay is None:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        time.sleep(delay)
+
+    def _on_success(self, response, estimate):
+        if self.request_bucket is not None:
+            with self._lock:
+                configured_rate = self.requests_per_minute / 60.0
+                self.request_bucket.rate = min(configured_rate, self.request_bucket.rate * 1.1)
+        usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+        used = usage.get("total_tokens")
+        if used and used > estimate and self.token_bucket is not None:
+            self.token_bucket.debit(used - estimate)
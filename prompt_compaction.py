@@ -0,0 +1,158 @@
+import html
+import os
+import re
+
+from llm_client import estimate_tokens
+from rule_prefilter import AUTO_RESOLVED, EXISTING_ARTICLE, KBA_REFERENCE, NEW_ARTICLE, USER_CONFIRMED
+
+# Shrinks the Resolution and Issue Description text embedded in the prompts. Service desk notes often
+# carry pasted e-mail threads: quoted replies, "From: / Sent:" headers, signatures, legal disclaimers
+# and HTML left over from the mail client, none of which helps the model answer. Those lines are
+# dropped, and text still over its token budget keeps the sentences that mention a KBA / solution
+# article or a user confirmation, plus as much of the context around them as fits.
+#
+# Anything matching KEY_PHRASES (the evidence the Q-3/Q-5/Q-6 prompts ask about) is never removed,
+# even from a quoted reply or beyond the budget. Text that has nothing to strip and fits its budget
+# is passed through unchanged, so its prompts (and their LLM cache entries) stay the same.
+
+PROMPT_RESOLUTION_TOKEN_BUDGET = int(os.getenv("PROMPT_RESOLUTION_TOKEN_BUDGET", "400"))
+PROMPT_ISSUE_DESCRIPTION_TOKEN_BUDGET = int(os.getenv("PROMPT_ISSUE_DESCRIPTION_TOKEN_BUDGET", "200"))
+
+KEY_PHRASES = re.compile("|".join([
+    KBA_REFERENCE, NEW_ARTICLE, EXISTING_ARTICLE, AUTO_RESOLVED, USER_CONFIRMED,
+    r"\bkba\b", r"knowledge\s+base", r"solution\s+article", r"\bconfirm", r"\backnowledg",
+    r"resolved\s+(?:itself|by\s+(?:the\s+)?user|without)", r"working\s+as\s+expected",
+]), re.IGNORECASE)
+
+# Markup a mail client leaves behind; only real tag names, so "<server>\\share" or "<error 0x80070005>" stay.
+# Block tags end a line; inline tags ("<b>KBA</b> 105") become a space so the sentence stays in one piece.
+HTML_TAG = re.compile(
+    r"<!--.*?-->|</?(?:a|b|i|u|p|br|hr|em|strong|span|div|font|center|blockquote|pre|h[1-6]|img|meta"
+    r"|html|head|body|style|table|thead|tbody|tr|td|th|ul|ol|li|o:p)\b[^<>]*>",
+    re.IGNORECASE | re.DOTALL,
+)
+HTML_BLOCK_TAG = re.compile(r"</?(?:p|br|hr|div|center|blockquote|pre|h[1-6]|table|thead|tbody|tr|ul|ol|li)\b",
+                            re.IGNORECASE)
+HTML_ENTITY = re.compile(r"&(?:[a-z]+|#\d+|#x[0-9a-f]+);", re.IGNORECASE)
+QUOTED_LINE = re.compile(r"^\s*>")
+# The start of a forwarded or replied-to message; everything from here to the end of the text is quoted.
+# A "From:" line only counts when the rest of a mail header ("Sent:", "To:", ...) follows it.
+REPLY_SEPARATOR = re.compile(r"^\s*(?:-{2,}\s*(?:original|forwarded)\s+message\s*-{2,}|on\s.+\swrote:\s*$)", re.IGNORECASE)
+HEADER_FROM = re.compile(r"^\s*from\s*:\s", re.IGNORECASE)
+HEADER_FIELD = re.compile(r"^\s*(?:sent|to|cc|date|subject)\s*:\s", re.IGNORECASE)
+# Lines after a "From:" line that may hold the rest of its header
+HEADER_LINES = 3
+SIGN_OFF = re.compile(
+    r"^\s*(?:(?:thanks?(?:\s+you)?|many\s+thanks|kind|best|warm)?\s*(?:&|and)?\s*regards|cheers|sincerely"
+    r"|sent\s+from\s+my\s)\b.{0,20}$",
+    re.IGNORECASE,
+)
+# Only dropped below a sign-off or in a quoted message; "confidential" alone means nothing in a note body
+DISCLAIMER = re.compile(
+    r"\b(?:confidential|intended\s+(?:solely\s+)?for\s+the\s+(?:use|addressee)|intended\s+recipient|disclaimer"
+    r"|please\s+consider\s+the\s+environment|virus(?:es)?\s+(?:free|scan))",
+    re.IGNORECASE,
+)
+# Lines a signature block is made of after its sign-off: a name, a title, phone numbers, addresses
+SIGNATURE_LINES = 4
+# Line breaks separate steps in resolution notes, except inside a sentence wrapped onto the next line
+HARD_WRAP = re.compile(r"\s*\n\s*(?=[a-z])")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\s*\n+\s*")
+OMITTED = "[...]"
+# Fewest tokens worth keeping from the start of a sentence that does not fit whole
+MIN_CUT_TOKENS = 8
+
+
+def reply_header_at(lines, i):
+    # Whether a quoted message starts at lines[i]; never on the first line, which is the note itself
+    if i == 0:
+        return False
+    if REPLY_SEPARATOR.match(lines[i]):
+        return True
+    return bool(HEADER_FROM.match(lines[i])) and any(HEADER_FIELD.match(line) for line in lines[i + 1:i + 1 + HEADER_LINES])
+
+
+def strip_noise(text):
+    # text without HTML remnants, quoted replies, signatures and disclaimers; lines with a key phrase
+    # survive wherever they are. Text with none of these, or nothing but these, comes back as it is.
+    original = text
+    if HTML_TAG.search(text) or HTML_ENTITY.search(text):
+        text = HTML_TAG.sub(lambda tag: "\n" if HTML_BLOCK_TAG.match(tag.group(0)) else " ", text)
+        text = re.sub(r"[ \t]{2,}", " ", html.unescape(text).replace("\xa0", " "))
+    kept = []
+    dropped = text != original
+    lines = text.splitlines()
+    quoted = False  # Inside a replied-to or forwarded message, which runs to the end of the text
+    signed_off = False  # Below a sign-off, where disclaimers are appended
+    signature = 0  # Lines of the current signature block still to drop, its sign-off included
+    for i, line in enumerate(lines):
+        if not quoted and reply_header_at(lines, i):
+            quoted = True
+        if SIGN_OFF.match(line):
+            signature = SIGNATURE_LINES + 1
+            signed_off = True
+        elif signature and (not line.strip() or len(line) > 80 or line.rstrip().endswith((".", "!", "?"))):
+            signature = 0  # A blank or sentence-like line ends the signature block
+        noise = (quoted or signature or QUOTED_LINE.match(line)
+                 or (signed_off and DISCLAIMER.search(line)))
+        signature = max(signature - 1, 0)
+        if noise and not KEY_PHRASES.search(line):
+            dropped = True
+            continue
+        kept.append(line.lstrip("> ").rstrip() if noise else line.rstrip())
+    stripped = re.sub(r"\n{3,}", "\n\n", "\n".join(kept)).strip()
+    if not dropped or not stripped:
+        return original
+    return stripped
+
+
+def cut_to_tokens(sentence, tokens):
+    # Leading part of sentence that fits about `tokens` tokens, cut at a word boundary where there is one
+    head = sentence[:tokens * 4]
+    if len(head) < len(sentence) and not sentence[len(head)].isspace() and " " in head.strip():
+        head = head[:head.rstrip().rindex(" ")]
+    return head.strip()
+
+
+def fit_to_budget(text, budget):
+    # Sentences with a key phrase always stay; the budget left over goes to the sentences closest to
+    # them, earlier sentences first, and the result keeps the original sentence order. A sentence that
+    # no longer fits keeps its leading part when at least MIN_CUT_TOKENS are left, so a long run-on
+    # note without sentence breaks is cut short instead of dropped.
+    text = HARD_WRAP.sub(" ", text)
+    sentences = [sentence.strip() for sentence in SENTENCE_BREAK.split(text) if sentence.strip()]
+    key = [i for i, sentence in enumerate(sentences) if KEY_PHRASES.search(sentence)]
+    chosen = {i: sentences[i] for i in key}
+    used = sum(estimate_tokens(sentences[i]) for i in key)
+    for i in sorted(range(len(sentences)), key=lambda i: (min((abs(i - k) for k in key), default=0), i)):
+        if i in chosen:
+            continue
+        cost = estimate_tokens(sentences[i])
+        if used + cost <= budget:
+            chosen[i] = sentences[i]
+            used += cost
+        elif budget - used >= MIN_CUT_TOKENS:
+            chosen[i] = cut_to_tokens(sentences[i], budget - used)
+            used = budget
+    if not chosen and sentences:
+        chosen[0] = cut_to_tokens(sentences[0], max(budget, MIN_CUT_TOKENS))
+    parts = []
+    for i, sentence in enumerate(sentences):
+        if i in chosen:
+            parts.append(chosen[i])
+        if chosen.get(i) != sentence and (not parts or parts[-1] != OMITTED):
+            parts.append(OMITTED)  # The sentence, or the rest of it, was left out
+    return " ".join(parts)
+
+
+def compact_text(text, budget):
+    # (compacted text, whether it had to be cut to the budget); the original text when nothing changes
+    if not isinstance(text, str) or not text.strip():
+        return text, False
+    compacted = strip_noise(text)
+    truncated = estimate_tokens(compacted) > budget
+    if truncated:
+        compacted = fit_to_budget(compacted, budget)
+    if compacted == text or not compacted.strip():
+        return text, False
+    return compacted, truncated
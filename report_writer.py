@@ -0,0 +1,103 @@
+import os
+
+import pandas as pd
+
+# Streaming writer for the Updated_Service_Desk_Incident_Management_Ticket_Audits report. Rows are
+# appended to a write-only openpyxl workbook as each chunk of tickets finishes, instead of building
+# the whole frame and its openpyxl object model at the end with DataFrame.to_excel. Optionally the
+# same rows go to a CSV or Parquet sidecar for downstream analytics.
+
+SIDECAR_FORMATS = ["csv", "parquet"]
+# Sidecar written next to every report by default ("" for none)
+REPORT_SIDECAR_FORMAT = os.getenv("REPORT_SIDECAR_FORMAT", "")
+
+
+def excel_value(value):
+    # openpyxl wants plain Python values; missing values become empty cells like with to_excel
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    return value.item() if hasattr(value, "item") else value
+
+
+def sidecar_path(report_path, sidecar_format):
+    return os.path.splitext(report_path)[0] + "." + sidecar_format
+
+
+class ReportWriter:
+    # output and sidecar_output are file paths or binary buffers (the Streamlit downloads use BytesIO).
+    # Call write() once per report chunk, then close(); nothing is readable from output before close().
+    def __init__(self, output, sidecar_format=None, sidecar_output=None):
+        from openpyxl import Workbook
+
+        if sidecar_format and sidecar_format not in SIDECAR_FORMATS:
+            raise ValueError(f"Unknown sidecar format '{sidecar_format}', expected one of {SIDECAR_FORMATS}")
+        if sidecar_format and sidecar_output is None:
+            raise ValueError("A sidecar format needs a sidecar output")
+        self.output = output
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet("Sheet1")
+        self.columns = None
+        self.rows = 0
+        self.sidecar_format = sidecar_format or None
+        self._sidecar_file = None
+        self._parquet_writer = None
+        if self.sidecar_format:
+            self._sidecar_file = open(sidecar_output, "wb") if isinstance(sidecar_output, str) else sidecar_output
+            self._owns_sidecar_file = isinstance(sidecar_output, str)
+
+    def _write_header(self, columns):
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Alignment, Border, Font, Side
+
+        # Same look as the pandas to_excel header: bold, thin border, centered
+        thin = Side(style="thin")
+        header = []
+        for column in columns:
+            cell = WriteOnlyCell(self.sheet, value=column)
+            cell.font = Font(bold=True)
+            cell.border = Border(left=thin, right=thin, top=thin, bottom=thin)
+            cell.alignment = Alignment(horizontal="center", vertical="top")
+            header.append(cell)
+        self.sheet.append(header)
+        self.columns = list(columns)
+
+    def write(self, chunk):
+        if self.columns is None:
+            self._write_header(chunk.columns)
+        chunk = chunk[self.columns]
+        for row in chunk.itertuples(index=False, name=None):
+            self.sheet.append([excel_value(value) for value in row])
+
+        if self.sidecar_format == "csv":
+            chunk.to_csv(self._sidecar_file, index=False, header=self.rows == 0, encoding="utf-8")
+        elif self.sidecar_format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            # Every column as text, so chunks with differently inferred types share one schema
+            table = pa.Table.from_pandas(chunk.astype("string"), preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self._sidecar_file, table.schema)
+            self._parquet_writer.write_table(table)
+        self.rows += len(chunk)
+
+    def close(self, columns=None):
+        # columns gives the header of a report without any rows
+        if self.columns is None and columns is not None:
+            self._write_header(columns)
+        self.workbook.save(self.output)
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+        if self._sidecar_file is not None and self._owns_sidecar_file:
+            self._sidecar_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._sidecar_file is not None and self._owns_sidecar_file:
+            self._sidecar_file.close()
@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+
+# Groups resolutions that say the same thing in different words ("User confirmed issue resolved,
+# closing ticket" / "Issue resolved, user confirmed. Closing the ticket") so that Q-3/Q-5/Q-6 are asked
+# once per group instead of once per ticket. Resolutions are clustered on their MiniLM embeddings with
+# a greedy leader pass: each block of vectors is compared with the cluster leaders found so far in one
+# matrix product, and a resolution joins the closest leader when their cosine similarity reaches
+# RESOLUTION_CLUSTER_THRESHOLD. Every cluster is then represented by its medoid, whose verdicts go to
+# the other members, unless the cluster is not cohesive (mean pairwise similarity of its members below
+# RESOLUTION_CLUSTER_MIN_COHESION), in which case every member is still evaluated on its own.
+
+# Cosine similarity from which a resolution counts as a paraphrase of a cluster leader
+RESOLUTION_CLUSTER_THRESHOLD = float(os.getenv("RESOLUTION_CLUSTER_THRESHOLD", "0.9"))
+# Mean pairwise similarity a cluster needs before its representative answers for all members
+RESOLUTION_CLUSTER_MIN_COHESION = float(os.getenv("RESOLUTION_CLUSTER_MIN_COHESION", "0.9"))
+# Share of the members that are still evaluated on their own, to measure agreement with their representative
+RESOLUTION_CLUSTER_CHECK_RATE = float(os.getenv("RESOLUTION_CLUSTER_CHECK_RATE", "0.05"))
+RESOLUTION_CLUSTER_BLOCK_SIZE = 1024
+
+
+def normalize_rows(embeddings):
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def leader_clusters(vectors, threshold, block_size=RESOLUTION_CLUSTER_BLOCK_SIZE):
+    # Cluster number of every row of vectors (L2-normalized); a row starts a new cluster when no leader
+    # so far is at least `threshold` similar to it
+    labels = np.empty(len(vectors), dtype=np.int64)
+    leaders = []
+    for start in range(0, len(vectors), block_size):
+        block = vectors[start:start + block_size]
+        if leaders:
+            similarities = block @ vectors[leaders].T
+            best = similarities.argmax(axis=1)
+            best_similarity = similarities[np.arange(len(block)), best]
+        block_leaders = []  # Leaders started within this block, which the matrix product above has not seen
+        for i, vector in enumerate(block):
+            if leaders and best_similarity[i] >= threshold:
+                labels[start + i] = best[i]
+                continue
+            if block_leaders:
+                similarities = vectors[block_leaders] @ vector
+                closest = int(similarities.argmax())
+                if similarities[closest] >= threshold:
+                    labels[start + i] = len(leaders) + closest
+                    continue
+            labels[start + i] = len(leaders) + len(block_leaders)
+            block_leaders.append(start + i)
+        leaders += block_leaders
+    return labels
+
+
+def cluster_representatives(embeddings, threshold=RESOLUTION_CLUSTER_THRESHOLD,
+                            min_cohesion=RESOLUTION_CLUSTER_MIN_COHESION):
+    # (representative row per row, or -1 where the row is evaluated on its own; cluster counts).
+    # Singletons and members of clusters below min_cohesion get -1; a representative maps to itself.
+    representatives = np.full(len(embeddings), -1, dtype=np.int64)
+    counts = {"clusters": 0, "low_cohesion": 0}
+    if not len(embeddings):
+        return representatives, counts
+    vectors = normalize_rows(embeddings)
+    labels = leader_clusters(vectors, threshold)
+    order = np.argsort(labels, kind="stable")
+    boundaries = np.flatnonzero(np.diff(labels[order])) + 1
+    for members in np.split(order, boundaries):
+        if len(members) < 2:
+            continue
+        counts["clusters"] += 1
+        total = vectors[members].sum(axis=0)
+        # Mean cosine similarity over all member pairs, from the length of the summed unit vectors
+        cohesion = (float(total @ total) - len(members)) / (len(members) * (len(members) - 1))
+        if cohesion < min_cohesion:
+            counts["low_cohesion"] += 1
+            continue
+        representatives[members] = members[int((vectors[members] @ total).argmax())]  # Medoid
+    return representatives, counts
@@ -0,0 +1,78 @@
+import json
+import re
+
+import pandas as pd
+
+
+# Deterministic fast path that runs before the LLM checks. Each rule gives a verdict for one question
+# when every one of its patterns matches the ticket field (all rules are evaluated column-wise over the
+# whole export). Rules are tried in order and the first matching rule decides the question; tickets no
+# rule decides are sent to the model as before.
+#
+# Only high-confidence patterns belong here: an explicit "KBA - 105" reference, "As per KBA - 87" or
+# "new KBA created", based on the keyword rules of Backup/app.py. A bare KBA number is not enough for
+# Q-6, since the prompts treat it as either an existing or a newly submitted article. Rules can be replaced with a JSON file of the same
+# shape (see load_rules).
+KBA_REFERENCE = r"kba\s*[-#:]?\s*\d+"
+# Negated mentions ("New KBA not required", "Did not need to create a new KBA") say the opposite; the
+# article and auto-resolution patterns only match inside a sentence with no negation word anywhere in it
+NEGATION = r"(?:\b(?:no|not|never|without|none|nor)\b|n['’]t\b)"
+
+
+def affirmed(pattern):
+    # pattern, matched from the start of a sentence (or line) that holds no NEGATION
+    return r"(?:^|(?<=[.!?;\n]))(?![^.!?;\n]*" + NEGATION + r")[^.!?;\n]*?(?:" + pattern + r")"
+
+
+NEW_ARTICLE = affirmed(r"\bnew\s+(?:kba|solution\s+article)\b"
+                       r"|\bkba\s*[-#:]?\s*\d+\s*(?:has\s+been\s+|was\s+)?(?:created|submitted|uploaded)\b")
+EXISTING_ARTICLE = r"\b(?:as\s+per|followed|using|referred\s+to|per)\s+(?:the\s*)?kba\s*[-#:]?\s*\d+"
+AUTO_RESOLVED = affirmed(r"\bauto[\s-]*resolved\b|\bresolved\s+on\s+its\s+own\b")
+USER_CONFIRMED = r"\buser\s+(?:has\s+)?(?:confirmed|acknowledged)\b"
+# "SERVICE - Brief Description": service name in uppercase, a spaced hyphen, then the description
+SUBJECT_FORMAT = r"^[A-Z0-9][A-Z0-9 &/._]* - \S.*"
+
+DEFAULT_RULES = [
+    # Q-2: subject already follows "SERVICE - Brief Description"
+    {"question": "Q-2", "field": "Subject", "patterns": [SUBJECT_FORMAT], "ignore_case": False, "verdict": "Yes"},
+
+    # Q-3: solution article noted
+    {"question": "Q-3", "field": "Resolution", "patterns": [NEW_ARTICLE], "verdict": "Yes"},
+    {"question": "Q-3", "field": "Resolution", "patterns": [KBA_REFERENCE], "verdict": "Yes"},
+    {"question": "Q-3", "field": "Resolution", "patterns": [AUTO_RESOLVED], "verdict": "Yes"},
+
+    # Q-5: user confirmation together with an article or an auto-resolution
+    {"question": "Q-5", "field": "Resolution", "patterns": [USER_CONFIRMED, KBA_REFERENCE], "verdict": "Yes"},
+    {"question": "Q-5", "field": "Resolution", "patterns": [USER_CONFIRMED, AUTO_RESOLVED], "verdict": "Yes"},
+
+    # Q-6: new article submitted, otherwise an existing one was used
+    {"question": "Q-6", "field": "Resolution", "patterns": [NEW_ARTICLE], "verdict": "Yes"},
+    {"question": "Q-6", "field": "Resolution", "patterns": [EXISTING_ARTICLE], "verdict": "n/a - Existing Article"},
+    {"question": "Q-6", "field": "Resolution", "patterns": [AUTO_RESOLVED], "verdict": "n/a - Existing Article"},
+]
+
+
+def load_rules(path=None):
+    # A JSON list of rules in the DEFAULT_RULES shape; falls back to the built-in rules
+    if not path:
+        return DEFAULT_RULES
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def apply_rules(df, rules=DEFAULT_RULES):
+    # Returns a DataFrame indexed like df with one column per question ("Q-2", ...) holding the
+    # rule verdict, or None where no rule matched and the model still has to decide
+    verdicts = {}
+    for rule in rules:
+        question = rule["question"]
+        decided = verdicts.setdefault(question, pd.Series(None, index=df.index, dtype=object))
+
+        text = df[rule["field"]].fillna("").astype(str)
+        flags = re.IGNORECASE if rule.get("ignore_case", True) else 0
+        matched = decided.isna()
+        for pattern in rule["patterns"]:
+            matched &= text.str.contains(re.compile(pattern, flags), regex=True)
+
+        decided[matched] = rule["verdict"]
+    return pd.DataFrame(verdicts, index=df.index)
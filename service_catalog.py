@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import re
+import sys
+from collections import Counter
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from rule_prefilter import SUBJECT_FORMAT
+
+# Catalog of the service names allowed as subject prefixes ("OUTLOOK - ..."). The Q-2 checks only
+# look at the shape of a subject; the catalog also checks that its prefix is a service we actually
+# support. Prefixes of a whole export are validated in one pass: exact matches through a set lookup,
+# the rest with one RapidFuzz cdist against the catalog, so close misspellings ("OUTLOK") get a
+# suggestion and everything else is reported as unknown, without any model call.
+#
+# Build the catalog from historical exports and/or a list of services (one per line):
+#
+#   python service_catalog.py doc/doc1/backup/*.xlsx --services services.txt
+
+SERVICE_CATALOG_PATH = os.getenv("SERVICE_CATALOG_PATH", os.path.join(".cache", "service_catalog.json"))
+# RapidFuzz ratio (0-100) from which an unknown prefix counts as a misspelling of a catalog service
+SERVICE_FUZZY_THRESHOLD = float(os.getenv("SERVICE_FUZZY_THRESHOLD", "80"))
+
+# "SERVICE - description" with any casing; the prefix is everything before the first spaced hyphen
+SUBJECT_PREFIX = r"^\s*(\S.*?)\s+-\s+\S"
+
+
+def normalize_service(name):
+    return re.sub(r"\s+", " ", str(name)).strip().upper()
+
+
+class ServiceCatalog:
+    def __init__(self, services, fuzzy_threshold=SERVICE_FUZZY_THRESHOLD):
+        self.services = sorted({normalize_service(service) for service in services if str(service).strip()})
+        self._known = set(self.services)
+        self.fuzzy_threshold = fuzzy_threshold
+
+    @classmethod
+    def from_subjects(cls, subjects, min_count=1, **kwargs):
+        # Prefixes of the well-formed subjects seen at least min_count times
+        subjects = pd.Series(subjects, dtype=object).dropna().astype(str).str.strip()
+        prefixes = subjects[subjects.str.match(SUBJECT_FORMAT)].str.extract(SUBJECT_PREFIX)[0].dropna()
+        counts = Counter(normalize_service(prefix) for prefix in prefixes)
+        return cls([service for service, count in counts.items() if count >= min_count], **kwargs)
+
+    def lookup(self, name):
+        # (catalog service, score) closest to name; score 100 for an exact match, None when the catalog is empty
+        from rapidfuzz import fuzz, process
+
+        name = normalize_service(name)
+        if name in self._known:
+            return name, 100.0
+        match = process.extractOne(name, self.services, scorer=fuzz.ratio)
+        return (match[0], match[1]) if match else None
+
+    def validate(self, subjects):
+        # One row per subject: the prefix, "known" / "misspelled" / "unknown" (NaN for subjects without
+        # a prefix), the closest catalog service and its similarity score
+        from rapidfuzz import fuzz, process
+
+        subjects = pd.Series(subjects, dtype=object)
+        prefixes = subjects.where(subjects.notna(), "").astype(str).str.extract(SUBJECT_PREFIX)[0]
+        normalized = prefixes.str.upper().str.replace(r"\s+", " ", regex=True)
+        result = pd.DataFrame({
+            "prefix": prefixes,
+            "status": np.where(normalized.isin(self._known), "known", None),
+            "suggestion": normalized.where(normalized.isin(self._known)),
+            "score": np.where(normalized.isin(self._known), 100.0, np.nan),
+        }, index=subjects.index)
+
+        unknown = normalized.notna() & ~normalized.isin(self._known)
+        if unknown.any():
+            candidates = normalized[unknown].unique()
+            if self.services:
+                scores = process.cdist(candidates, self.services, scorer=fuzz.ratio, workers=-1)
+                best = scores.argmax(axis=1)
+                closest = {name: (self.services[i], float(scores[row, i])) for row, (name, i) in enumerate(zip(candidates, best))}
+            else:
+                closest = {name: (None, 0.0) for name in candidates}
+            matches = normalized[unknown].map(closest)
+            result.loc[unknown, "suggestion"] = matches.str[0]
+            result.loc[unknown, "score"] = matches.str[1]
+            result.loc[unknown, "status"] = np.where(
+                result.loc[unknown, "score"] >= self.fuzzy_threshold, "misspelled", "unknown"
+            )
+        return result
+
+    def flags(self, subjects):
+        # (verdict, note) for each subject whose service prefix is not in the catalog, None elsewhere
+        validation = self.validate(subjects)
+        flags = []
+        for prefix, status, suggestion in zip(validation["prefix"], validation["status"], validation["suggestion"]):
+            if status == "misspelled":
+                flags.append(("Manual audit required", f" |Q2- Service '{prefix}' is not in the service catalog, did you mean '{suggestion}'?"))
+            elif status == "unknown":
+                flags.append(("Manual audit required", f" |Q2- Service '{prefix}' is not in the service catalog"))
+            else:
+                flags.append(None)
+        return flags
+
+    def save(self, path, **fields):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"services": self.services, **fields}, f, indent=2)
+
+
+def read_service_list(path):
+    # One service per line (a .json catalog written by save() works too)
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)["services"]
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def load_service_catalog(path=SERVICE_CATALOG_PATH):
+    # None when no catalog has been built, which turns the service check off
+    if not path or not os.path.exists(path):
+        return None
+    return ServiceCatalog(read_service_list(path))
+
+
+def main(argv=None):
+    from export_reader import iter_export_chunks
+
+    parser = argparse.ArgumentParser(description="Build the service catalog used to validate subject prefixes.")
+    parser.add_argument("exports", nargs="*", help="historical Current_day_by_Technician exports (.xlsx)")
+    parser.add_argument("--services", action="append", default=[], help="file with one service name per line")
+    parser.add_argument("--min-count", type=int, default=2,
+                        help="times a prefix must appear in the exports to be cataloged (default: %(default)s)")
+    parser.add_argument("--output", default=SERVICE_CATALOG_PATH, help="catalog file (default: %(default)s)")
+    args = parser.parse_args(argv)
+    if not args.exports and not args.services:
+        parser.error("give historical exports and/or --services lists")
+
+    subjects = []
+    for path in args.exports:
+        for chunk in iter_export_chunks(path, columns=['Subject']):
+            subjects += chunk['Subject'].tolist()
+    from_history = ServiceCatalog.from_subjects(subjects, min_count=args.min_count).services
+    listed = [service for path in args.services for service in read_service_list(path)]
+    catalog = ServiceCatalog(from_history + listed)
+    catalog.save(args.output, built_from=args.exports + args.services,
+                 built_at=datetime.now(timezone.utc).isoformat(timespec="seconds"))
+    print(f"{len(catalog.services)} services ({len(from_history)} from {len(subjects)} historical subjects, "
+          f"{len(listed)} listed) -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import argparse
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the Groq chat completions API, for exercising the rate limiter and retries
+# without spending quota. It answers the audit prompts with deterministic canned replies and can
+# inject latency, 429s and 5xx errors:
+#
+#   python stub_llm_server.py --port 8765 --latency-ms 300 --rate-limit-fraction 0.2
+#   GROQ_API_BASE=http://127.0.0.1:8765 GROQ_API_KEY=stub python audit_cli.py export.xlsx --no-cache
+
+
+def canned_answer(prompt):
+    # Cheap, deterministic stand-in for the model's answer to each audit prompt
+    text = prompt.lower()
+    resolution = text.rsplit("resolution", 1)[-1]
+    kba = "kba" in resolution or "solution article" in resolution
+    new_article = bool(re.search(r"new\s+(kba|solution article)", resolution))
+    confirmed = "confirmed" in resolution
+
+    if "generated subject header" in text:
+        issue = re.search(r'issue description: "(.*?)"', prompt, re.DOTALL | re.IGNORECASE)
+        words = (issue.group(1) if issue else "issue").split()
+        return f"{(words[0] if words else 'ISSUE').upper()} - {' '.join(words[1:8])}"
+    if '"q3"' in text:
+        return json.dumps({
+            "q3": "New article submitted" if new_article else "Yes" if kba else "Manual Audit required",
+            "q5": "Yes" if kba and confirmed else "Manual audit required",
+            "q6": "Yes" if new_article else "n/a - Existing Article" if kba else "No",
+        })
+    if "user confirmation" in text:
+        return "Yes" if kba and confirmed else "Manual audit required"
+    if "return 'no'" in text:
+        return "Yes" if new_article else "n/a - Existing Article" if kba else "No"
+    return "New article submitted" if new_article else "Yes" if kba else "Manual Audit required"
+
+
+def make_handler(args):
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not self.path.endswith("/chat/completions"):
+                return self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+
+            time.sleep(max(0.0, random.gauss(args.latency_ms, args.latency_ms * 0.25)) / 1000.0)
+            roll = random.random()
+            if roll < args.rate_limit_fraction:
+                return self._send(429, {"error": {"message": "Rate limit reached (stub)", "type": "tokens"}},
+                                  {"retry-after": str(args.retry_after)})
+            if roll < args.rate_limit_fraction + args.error_fraction:
+                return self._send(503, {"error": {"message": "Service unavailable (stub)"}})
+
+            prompt = "".join(str(message.get("content", "")) for message in body.get("messages", []))
+            answer = canned_answer(prompt)
+            prompt_tokens, completion_tokens = len(prompt) // 4, len(answer) // 4 + 1
+            self._send(200, {
+                "id": "stub", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+
+        def _send(self, status, payload, headers=None):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *log_args):
+            if args.verbose:
+                super().log_message(format, *log_args)
+
+    return StubHandler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stub Groq/OpenAI chat completions server for local testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="mean response latency")
+    parser.add_argument("--rate-limit-fraction", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--error-fraction", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with a 429")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args))
+    print(f"Stub LLM server listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
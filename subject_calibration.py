@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+import audit_engine
+from export_reader import read_export
+
+# Calibrates the local Q-2 engine (SUBJECT_CHECK_MODE=local) on audited workbooks. Each audited report
+# is joined on Request ID to the export it was made from; the local engine scores every ticket's issue
+# description against its subject, and the similarity threshold that reproduces the most recorded Q-2
+# verdicts is written to LOCAL_SUBJECT_CALIBRATION_PATH, where every later run picks it up:
+#
+#   python subject_calibration.py --report doc/doc1/Result-1/Updated_Service_Desk_Incident_Management_Ticket_Audits.xlsx \
+#       --export doc/doc1/Result-1/Current_day_by_Technician.xlsx
+#
+# --report / --export can be repeated to calibrate on several days at once.
+
+DEFAULT_REPORT_PATH = os.path.join('doc', 'doc1', 'Result-1', audit_engine.REPORT_FILE_NAME)
+DEFAULT_EXPORT_PATH = os.path.join('doc', 'doc1', 'Result-1', 'Current_day_by_Technician.xlsx')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate the local Q-2 subject check on audited workbooks.")
+    parser.add_argument("--report", action="append", help=f"audited report workbook (default: {DEFAULT_REPORT_PATH})")
+    parser.add_argument("--export", action="append", help=f"export the report was made from (default: {DEFAULT_EXPORT_PATH})")
+    parser.add_argument("--output", default=audit_engine.LOCAL_SUBJECT_CALIBRATION_PATH,
+                        help="where the calibrated threshold is written (default: %(default)s)")
+    parser.add_argument("--dry-run", action="store_true", help="only print the calibration, do not write it")
+    args = parser.parse_args(argv)
+    args.report = args.report or [DEFAULT_REPORT_PATH]
+    args.export = args.export or [DEFAULT_EXPORT_PATH]
+    if len(args.report) != len(args.export):
+        parser.error("give one --export per --report")
+    return args
+
+
+def load_audited_tickets(report_path, export_path):
+    # Export tickets with the Q-2 verdict recorded for them in the audited report
+    tickets = audit_engine.audited_tickets(pd.read_excel(report_path), read_export(export_path))
+    tickets = tickets.rename(columns={'Q-2': 'Verdict'})
+    return tickets[tickets['Verdict'].notna()].reset_index(drop=True)
+
+
+def agreement(labels, formatted, scores, threshold):
+    return float(np.mean(labels == (formatted & (scores >= threshold))))
+
+
+def calibrate(labels, formatted, scores):
+    # Threshold with the highest agreement; among equally good thresholds the middle one, so the
+    # calibration sits between the recorded "Yes" and "Manual audit" tickets rather than on either edge
+    candidates = np.round(np.arange(0.0, 1.0001, 0.01), 2)
+    agreements = np.array([agreement(labels, formatted, scores, threshold) for threshold in candidates])
+    best = candidates[agreements == agreements.max()]
+    return float(best[len(best) // 2]), float(agreements.max())
+
+
+def main(argv=None):
+    load_dotenv()
+    args = parse_args(argv)
+
+    tickets = pd.concat([load_audited_tickets(report, export) for report, export in zip(args.report, args.export)],
+                        ignore_index=True)
+    if tickets.empty:
+        print("No audited tickets with a Q-2 verdict found in the given workbooks", file=sys.stderr)
+        return 1
+
+    embedding_cache = audit_engine.open_embedding_cache() if audit_engine.EMBEDDING_CACHE_ENABLED else None
+    ctx = audit_engine.AuditContext(None, audit_engine.load_semantic_model(), embedding_cache=embedding_cache)
+    descriptions = tickets['Issue Description'].tolist()
+    subjects = tickets['Subject'].tolist()
+    # Same format check as the local engine; only well-formed subjects get a similarity score
+    formatted = np.array([
+        pd.notna(description) and pd.notna(subject)
+        and audit_engine.SUBJECT_FORMAT_PATTERN.match(str(subject).strip()) is not None
+        for description, subject in zip(descriptions, subjects)
+    ])
+    similarities = audit_engine.pair_similarities(ctx, descriptions, subjects, list(np.flatnonzero(formatted)))
+    scores = np.array([similarities.get(position, 0.0) for position in range(len(tickets))])
+    labels = tickets['Verdict'].astype(str).str.strip().str.lower().eq('yes').to_numpy()
+
+    threshold, best_agreement = calibrate(labels, formatted, scores)
+    current = ctx.subject_threshold
+    print(f"{len(tickets)} audited tickets, {labels.sum()} with Q-2 'Yes', {formatted.sum()} with a well-formed subject")
+    print(f"Agreement with the recorded verdicts: {agreement(labels, formatted, scores, current):.1%} at the "
+          f"current threshold {current:.2f}, {best_agreement:.1%} at the calibrated threshold {threshold:.2f}")
+    if args.dry_run:
+        return 0
+
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "threshold": threshold,
+            "agreement": round(best_agreement, 3),
+            "tickets": len(tickets),
+            "model": audit_engine.SEMANTIC_MODEL_NAME,
+            "reports": args.report,
+            "calibrated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }, f, indent=2)
+    print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,33 @@
+import pytest
+
+import audit_engine
+from audit_benchmark import StubChat, StubEmbedder
+
+
+def run_key(model_name="stub", backend="stub", **options):
+    chat = StubChat(latency_ms=0)
+    chat.model_name, chat.backend = model_name, backend
+    return audit_engine.AuditContext(chat, StubEmbedder(), run_key="export-sha", **options).run_key
+
+
+def test_same_export_and_settings_resume_the_same_run():
+    assert run_key() == run_key()
+    assert run_key(coalesce=False) == run_key()  # Coalescing does not change any verdict
+
+
+@pytest.mark.parametrize("changed", [
+    {"model_name": "other"},
+    {"backend": "openai"},
+    {"resolution_mode": "separate"},
+    {"subject_mode": "local"},
+    {"prompt_compaction": False},
+    {"resolution_clustering": True},
+])
+def test_other_settings_do_not_resume_the_run(changed):
+    baseline = {"resolution_mode": "combined", "subject_mode": "llm", "prompt_compaction": True,
+                "resolution_clustering": False}
+    assert run_key(**{**baseline, **changed}) != run_key(**baseline)
+
+
+def test_no_export_key_means_no_checkpointing():
+    assert audit_engine.AuditContext(StubChat(), StubEmbedder()).run_key is None
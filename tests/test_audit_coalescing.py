@@ -0,0 +1,34 @@
+from concurrent.futures import Future
+
+import pandas as pd
+from cachetools import LRUCache
+
+import audit_engine
+from audit_benchmark import StubChat, StubEmbedder, synthetic_export
+
+
+def audit_in_chunks(export, chunks=4, coalesced=None):
+    ctx = audit_engine.AuditContext(StubChat(latency_ms=0), StubEmbedder())
+    if coalesced is not None:
+        ctx.coalesced = coalesced
+    size = -(-len(export) // chunks)
+    parts = [export.iloc[start:start + size] for start in range(0, len(export), size)]
+    report = pd.concat(audit_engine.iter_audit(ctx, parts, pd.read_excel(audit_engine.DEFAULT_TEMPLATE_PATH)))
+    return ctx, report
+
+
+def test_coalesced_map_keeps_verdicts_not_futures():
+    ctx, _ = audit_in_chunks(synthetic_export(200, seed=4))
+    assert len(ctx.coalesced) > 0
+    assert not any(isinstance(entry, Future) for entry in ctx.coalesced.values())
+    assert all(isinstance(entry, dict) for entry in ctx.coalesced.values())
+
+
+def test_bounded_coalesced_map_gives_the_same_report():
+    export = synthetic_export(200, seed=4)
+    _, unbounded = audit_in_chunks(export)
+
+    ctx, bounded = audit_in_chunks(export, coalesced=LRUCache(maxsize=5))
+
+    assert len(ctx.coalesced) <= 5
+    pd.testing.assert_frame_equal(bounded, unbounded)
@@ -0,0 +1,26 @@
+import pandas as pd
+
+import audit_engine
+from audit_benchmark import StubChat, StubEmbedder, synthetic_export
+from rule_prefilter import DEFAULT_RULES
+
+
+def audit(ledger, export):
+    chat = StubChat(latency_ms=0)
+    ctx = audit_engine.AuditContext(chat, StubEmbedder(), rules=DEFAULT_RULES, ledger=ledger, coalesce=False)
+    report, stats = audit_engine.run_audit(ctx, export, pd.read_excel(audit_engine.DEFAULT_TEMPLATE_PATH))
+    return report, stats
+
+
+def test_identical_rerun_makes_no_llm_calls(tmp_path):
+    export = synthetic_export(200, seed=11)
+    # Rules decide Q-3/Q-6 of these tickets but leave Q-5 (no user confirmation) to the model
+    export.loc[::4, 'Resolution'] = "As per KBA - 87 reset the password in Active Directory."
+    ledger = audit_engine.open_ledger(str(tmp_path))
+
+    first_report, first = audit(ledger, export)
+    second_report, second = audit(ledger, export)
+
+    assert first["llm_calls"] > 0
+    assert second["llm_calls"] == 0
+    pd.testing.assert_frame_equal(first_report, second_report)
@@ -0,0 +1,14 @@
+import pandas as pd
+
+from audit_engine import LLM_COLUMNS, LLM_ERROR_VERDICT, Q3_COLUMN, build_notes
+
+
+def test_kba_missing_is_noted_when_q3_finds_no_article():
+    existing = pd.Series(["Checked", None, None, None])
+    fragments = pd.DataFrame({column: [None] * 4 for column in LLM_COLUMNS})
+    fragments[Q3_COLUMN] = [" |Q3- no article", None, None, None]
+    q3 = pd.Series(["Manual audit required", "Manual Audit required", "Yes", LLM_ERROR_VERDICT])
+
+    notes = build_notes(existing, fragments, q3)
+
+    assert notes.tolist() == ["Checked |Q3- no article, KBA is missing", "KBA is missing", "", ""]
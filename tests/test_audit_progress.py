@@ -0,0 +1,17 @@
+import pandas as pd
+
+import audit_engine
+from audit_benchmark import StubChat, StubEmbedder, synthetic_export
+
+
+def test_tickets_done_moves_within_a_chunk():
+    export = synthetic_export(120, seed=9)
+    ctx = audit_engine.AuditContext(StubChat(latency_ms=0), StubEmbedder(), coalesce=False)
+    seen = []
+    audit_engine.run_audit(ctx, export, pd.read_excel(audit_engine.DEFAULT_TEMPLATE_PATH),
+                           progress=lambda done, total: seen.append(ctx.tickets_done()))
+
+    # The whole export is one chunk, so stats["tickets"] stays at 0 until the end
+    assert any(0 < done < len(export) for done in seen)
+    assert seen == sorted(seen)
+    assert ctx.tickets_done() == len(export)
@@ -0,0 +1,32 @@
+import numpy as np
+
+from audit_benchmark import StubEmbedder
+from embedding_cache import EmbeddingCache
+
+
+def test_reads_rows_written_by_another_instance_after_opening_empty(tmp_path):
+    model = StubEmbedder(dimensions=16)
+    reader = EmbeddingCache("stub", cache_dir=str(tmp_path))
+    writer = EmbeddingCache("stub", cache_dir=str(tmp_path))
+    assert reader.dimensions is None
+
+    written, counts = writer.encode(model, ["PASSWORD - Reset", "VPN - Cannot connect"])
+    assert counts["encoded"] == 2
+
+    vectors, counts = reader.encode(model, ["VPN - Cannot connect", "PASSWORD - Reset"])
+    assert counts["disk_hits"] == 2 and counts["encoded"] == 0
+    assert reader.dimensions == 16
+    np.testing.assert_array_equal(vectors, written[::-1])
+
+
+def test_appends_after_another_instance_keep_one_dimension(tmp_path):
+    model = StubEmbedder(dimensions=16)
+    first = EmbeddingCache("stub", cache_dir=str(tmp_path))
+    second = EmbeddingCache("stub", cache_dir=str(tmp_path))
+    first.encode(model, ["PASSWORD - Reset"])
+    second.encode(model, ["PRINTER - Offline"])
+
+    reopened = EmbeddingCache("stub", cache_dir=str(tmp_path))
+    vectors, counts = reopened.encode(model, ["PASSWORD - Reset", "PRINTER - Offline"])
+    assert counts["disk_hits"] == 2
+    np.testing.assert_allclose(vectors, model.encode(["PASSWORD - Reset", "PRINTER - Offline"]))
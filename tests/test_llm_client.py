@@ -0,0 +1,131 @@
+import types
+
+import pytest
+
+import llm_client
+from llm_client import LLMError, RateLimitedChat, TokenBucket
+
+
+class FakeClock:
+    # Stands in for the time module: sleep() only moves the clock forward and is recorded
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = types.SimpleNamespace(status_code=status_code, headers=headers or {})
+
+
+class ScriptedChat:
+    # Raises the scripted errors in turn, then answers
+    model_name = "scripted"
+    temperature = 0
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return types.SimpleNamespace(content="Yes", response_metadata={})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_client, "time", clock)
+    monkeypatch.setattr(llm_client.random, "uniform", lambda low, high: high)
+    return clock
+
+
+def test_token_bucket_waits_for_refill(clock):
+    bucket = TokenBucket(60)  # one token per second
+    for _ in range(60):
+        bucket.acquire()
+    assert clock.sleeps == []
+
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(1.0)]
+
+    clock.now += 10
+    for _ in range(10):
+        bucket.acquire()
+    assert len(clock.sleeps) == 1
+
+
+def test_token_bucket_caps_requests_larger_than_capacity(clock):
+    bucket = TokenBucket(60)
+    bucket.acquire(60)
+    bucket.acquire(500)  # waits for a full bucket instead of forever
+    assert sum(clock.sleeps) == pytest.approx(60.0)
+
+
+def test_retry_after_header_sets_the_delay(clock):
+    chat = RateLimitedChat(ScriptedChat([StatusError(503, {"retry-after": "7"})]),
+                           requests_per_minute=None, tokens_per_minute=None)
+    assert chat.invoke(["prompt"]).content == "Yes"
+    assert clock.sleeps == [7.0]
+    assert chat.retries == 1
+
+
+def test_backoff_is_exponential_without_retry_after(clock):
+    chat = RateLimitedChat(ScriptedChat([StatusError(500)] * 3), requests_per_minute=None,
+                           tokens_per_minute=None, base_delay=1.0, max_delay=3.0)
+    chat.invoke(["prompt"])
+    assert clock.sleeps == [1.0, 2.0, 3.0]
+
+
+def test_rate_limit_halves_the_request_rate_and_success_restores_it(clock):
+    chat = RateLimitedChat(ScriptedChat([StatusError(429), StatusError(429)]),
+                           requests_per_minute=60, tokens_per_minute=None)
+    chat.invoke(["prompt"])
+    assert chat.rate_limited == 2
+    assert chat.request_bucket.rate == pytest.approx(1.0 / 4 * 1.1)
+
+    for _ in range(30):
+        chat.invoke(["prompt"])
+    assert chat.request_bucket.rate == pytest.approx(1.0)
+
+
+def test_gives_up_after_max_retries(clock):
+    scripted = ScriptedChat([StatusError(429)] * 10)
+    chat = RateLimitedChat(scripted, requests_per_minute=None, tokens_per_minute=None, max_retries=3)
+    with pytest.raises(LLMError, match="gave up after 4 attempts"):
+        chat.invoke(["prompt"])
+    assert scripted.calls == 4
+    assert chat.retries == 3
+
+
+def test_non_retryable_errors_are_not_retried(clock):
+    scripted = ScriptedChat([StatusError(401)])
+    chat = RateLimitedChat(scripted, requests_per_minute=None, tokens_per_minute=None)
+    with pytest.raises(LLMError, match="401"):
+        chat.invoke(["prompt"])
+    assert scripted.calls == 1
+    assert clock.sleeps == []
+
+
+def test_failed_combined_call_is_logged_once(clock, caplog):
+    import audit_engine
+    from audit_benchmark import StubEmbedder
+
+    chat = RateLimitedChat(ScriptedChat([StatusError(401)]), requests_per_minute=None, tokens_per_minute=None)
+    ctx = audit_engine.AuditContext(chat, StubEmbedder())
+    with caplog.at_level("ERROR", logger="audit_engine"):
+        results = audit_engine.check_resolution_combined(ctx, "Rebooted the laptop.")
+    assert {verdict for verdict, _ in results.values()} == {audit_engine.LLM_ERROR_VERDICT}
+    assert len(caplog.records) == 1
+    assert "Groq" not in caplog.text
@@ -0,0 +1,87 @@
+import pytest
+
+from llm_client import estimate_tokens
+from prompt_compaction import OMITTED, compact_text, fit_to_budget, strip_noise
+
+EMAIL_THREAD = """Reinstalled Outlook and rebuilt the profile.<br>User confirmed mail is working as expected.<br><br>Thanks &amp; Regards,<br>John Smith<br>Service Desk Analyst<br>+1 555 0100<br><br>This e-mail and any attachments are confidential and intended solely for the addressee.<br>
+-----Original Message-----
+From: Jane Doe
+Sent: Monday
+To: Service Desk
+Subject: RE: Outlook
+> Hi, can you look at my Outlook again?
+> Regards, Jane"""
+
+
+def test_strip_noise_drops_signature_disclaimer_and_quoted_reply():
+    stripped = strip_noise(EMAIL_THREAD)
+    assert stripped == "Reinstalled Outlook and rebuilt the profile.\nUser confirmed mail is working as expected."
+
+
+def test_strip_noise_keeps_key_phrases_in_quoted_reply():
+    text = "Cleared the cache.\nOn Monday Jane wrote:\n> I confirm the issue is resolved.\n> See you"
+    assert strip_noise(text) == "Cleared the cache.\nI confirm the issue is resolved."
+
+
+@pytest.mark.parametrize("text", [
+    "Date: 14/04 user called about Outlook\nRebuilt the Outlook profile and mail syncs again.",
+    "Added user to the confidential share group on FS01.\nUser confirmed access.",
+    "Mapped <server>\\\\finance\\share, cleared <error 0x80070005> by resetting ACLs.",
+    "To: be checked by L2\nFrom: the logs the driver crashed.",
+    "Regards,\nJohn",
+])
+def test_strip_noise_leaves_ordinary_notes_alone(text):
+    assert strip_noise(text) == text
+
+
+def test_strip_noise_turns_inline_tags_into_spaces():
+    assert strip_noise("Followed <b>KBA</b> - 105 to <span>reset</span> it.<br>Done.") == \
+        "Followed KBA - 105 to reset it.\nDone."
+
+
+def test_fit_to_budget_keeps_key_sentences_and_their_neighbours():
+    text = " ".join(f"Step {i} restarted service number {i} again." for i in range(40)) + \
+        " Followed KBA - 105 to finish. Closed."
+    fitted = fit_to_budget(text, 40)
+    assert "Followed KBA - 105 to finish." in fitted
+    assert fitted.endswith("Closed.")
+    assert fitted.startswith(OMITTED)
+    assert estimate_tokens(fitted) <= 40 + 10
+
+
+def test_fit_to_budget_cuts_a_run_on_sentence_at_a_word_boundary():
+    text = "user reported outlook crash " * 300
+    fitted = fit_to_budget(text, 100)
+    assert fitted != OMITTED
+    assert fitted.endswith(" " + OMITTED)
+    head = fitted[:-len(OMITTED) - 1]
+    assert text.startswith(head) and text[len(head)] == " "
+    assert 90 <= estimate_tokens(head) <= 100
+
+
+def test_fit_to_budget_keeps_text_when_budget_is_tiny():
+    fitted = fit_to_budget("Rebooted the laptop and reapplied the group policy for the user", 1)
+    assert fitted.startswith("Rebooted")
+
+
+def test_compact_text_passes_clean_short_text_through():
+    text = "Reset the password as per KBA - 105. User confirmed the issue is resolved."
+    assert compact_text(text, 400) == (text, False)
+
+
+def test_compact_text_truncates_over_budget_text():
+    text = "user reported outlook crash " * 300
+    compacted, truncated = compact_text(text, 100)
+    assert truncated
+    assert compacted.startswith("user reported outlook crash")
+
+
+@pytest.mark.parametrize("text", [None, float("nan"), "", "   "])
+def test_compact_text_ignores_missing_text(text):
+    compacted, truncated = compact_text(text, 100)
+    assert compacted is text and not truncated
+
+
+def test_compact_text_never_returns_blank():
+    text = "-----Original Message-----\nFrom: Jane\nSent: Monday\nThanks"
+    assert compact_text("\n" + text, 100)[0].strip()
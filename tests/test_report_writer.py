@@ -0,0 +1,60 @@
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from report_writer import ReportWriter
+
+
+def report_frame(rows=25):
+    rng = np.random.default_rng(3)
+    return pd.DataFrame({
+        "Request ID": [f"REQ{i:05d}" for i in range(rows)],
+        "Ticket": rng.integers(1000, 9999, rows),
+        "Score": np.where(np.arange(rows) % 4 == 0, np.nan, rng.random(rows).round(3)),
+        "Created": pd.date_range("2026-01-01 08:30", periods=rows, freq="7h"),
+        "Q-3": np.where(np.arange(rows) % 3 == 0, "Manual audit required", "Yes"),
+        "Notes": [None if i % 5 else f" |Q3- note {i}" for i in range(rows)],
+    })
+
+
+def write_in_chunks(frame, chunk_size, sidecar_format=None):
+    report, sidecar = BytesIO(), BytesIO() if sidecar_format else None
+    with ReportWriter(report, sidecar_format=sidecar_format, sidecar_output=sidecar) as writer:
+        for start in range(0, len(frame), chunk_size):
+            writer.write(frame.iloc[start:start + chunk_size])
+    return report, sidecar
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 25, 100])
+def test_workbook_matches_to_excel(chunk_size):
+    frame = report_frame()
+    expected = BytesIO()
+    frame.to_excel(expected, index=False)
+    report, _ = write_in_chunks(frame, chunk_size)
+
+    pd.testing.assert_frame_equal(pd.read_excel(BytesIO(report.getvalue())), pd.read_excel(BytesIO(expected.getvalue())))
+
+
+def test_csv_sidecar_matches_to_csv():
+    frame = report_frame()
+    expected = BytesIO()
+    frame.to_csv(expected, index=False, encoding="utf-8")
+    _, sidecar = write_in_chunks(frame, 7, "csv")
+
+    assert sidecar.getvalue() == expected.getvalue()
+
+
+def test_parquet_sidecar_round_trips_as_text():
+    pytest.importorskip("pyarrow")
+    frame = report_frame()
+    _, sidecar = write_in_chunks(frame, 7, "parquet")
+
+    pd.testing.assert_frame_equal(pd.read_parquet(BytesIO(sidecar.getvalue())), frame.astype("string"))
+
+
+def test_header_only_report():
+    report = BytesIO()
+    ReportWriter(report).close(columns=["Request ID", "Q-3"])
+    assert list(pd.read_excel(BytesIO(report.getvalue())).columns) == ["Request ID", "Q-3"]
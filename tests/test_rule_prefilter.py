@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+from rule_prefilter import DEFAULT_RULES, apply_rules
+
+
+def verdicts_for(resolution):
+    df = pd.DataFrame({"Subject": ["printer issue"], "Resolution": [resolution]})
+    return apply_rules(df, DEFAULT_RULES).iloc[0]
+
+
+@pytest.mark.parametrize("resolution", [
+    "New KBA not required, restarted the spooler.",
+    "Did not need to create new KBA for this.",
+    "No  new KBA needed.",
+    "No new solution article required",
+    "Restarted the spooler; didn't create a new KBA.",
+    "Restarted the spooler; didn’t create a new KBA.",
+    "Without a new KBA, issue fixed by reboot.",
+    "Issue was not auto resolved, reinstalled the driver.",
+    "It never resolved on its own.",
+])
+def test_negated_mentions_are_left_to_the_model(resolution):
+    verdicts = verdicts_for(resolution)
+    assert pd.isna(verdicts["Q-3"])
+    assert pd.isna(verdicts["Q-6"])
+
+
+def test_negated_creation_of_a_numbered_kba_is_not_a_new_article():
+    # The KBA number alone still notes an article for Q-3; Q-6 is left to the model
+    verdicts = verdicts_for("KBA 105 was not created")
+    assert verdicts["Q-3"] == "Yes"
+    assert pd.isna(verdicts["Q-6"])
+
+
+@pytest.mark.parametrize("resolution, q3, q6", [
+    ("Created a new KBA for the printer reset.", "Yes", "Yes"),
+    ("Driver reinstalled. New KBA submitted.", "Yes", "Yes"),
+    ("Not reproducible at first. New KBA created after the second call.", "Yes", "Yes"),
+    ("KBA-205 has been created", "Yes", "Yes"),
+    ("Issue auto-resolved after the update.", "Yes", "n/a - Existing Article"),
+    ("As per KBA - 87 reset the password.", "Yes", "n/a - Existing Article"),
+    ("No reply from user. As per KBA - 87 reset the password.", "Yes", "n/a - Existing Article"),
+])
+def test_affirmed_mentions_are_decided(resolution, q3, q6):
+    verdicts = verdicts_for(resolution)
+    assert verdicts["Q-3"] == q3
+    assert verdicts["Q-6"] == q6
+
+
+def test_user_confirmation_with_article_decides_q5():
+    assert verdicts_for("As per KBA - 87 reset the password, user confirmed.")["Q-5"] == "Yes"
+    assert pd.isna(verdicts_for("As per KBA - 87 reset the password.")["Q-5"])
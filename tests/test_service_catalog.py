@@ -0,0 +1,87 @@
+import pandas as pd
+import pytest
+
+import audit_engine
+from audit_benchmark import StubChat, StubEmbedder, synthetic_export
+from service_catalog import ServiceCatalog
+
+SERVICES = ["OUTLOOK", "VPN", "MS TEAMS", "PASSWORD"]
+
+
+@pytest.fixture
+def catalog():
+    return ServiceCatalog(SERVICES, fuzzy_threshold=80)
+
+
+def test_lookup_exact_and_normalized(catalog):
+    assert catalog.lookup("OUTLOOK") == ("OUTLOOK", 100.0)
+    assert catalog.lookup("  ms   teams ") == ("MS TEAMS", 100.0)
+
+
+def test_lookup_returns_the_closest_service(catalog):
+    service, score = catalog.lookup("OUTLOK")
+    assert service == "OUTLOOK"
+    assert 80 <= score < 100
+
+
+def test_lookup_on_an_empty_catalog():
+    assert ServiceCatalog([]).lookup("VPN") is None
+
+
+def test_validate_splits_known_misspelled_and_unknown(catalog):
+    validation = catalog.validate([
+        "OUTLOOK - Mailbox full",
+        "Vpn - cannot connect",
+        "OUTLOK - Cannot open",
+        "SAP - Login fails",
+        "printer not working",
+        None,
+    ])
+    assert validation["status"].tolist()[:4] == ["known", "known", "misspelled", "unknown"]
+    assert validation["status"].iloc[4:].isna().all()
+    assert validation["prefix"].tolist()[:4] == ["OUTLOOK", "Vpn", "OUTLOK", "SAP"]
+    assert validation["suggestion"].iloc[2] == "OUTLOOK"
+    assert validation["score"].iloc[0] == 100.0
+    assert validation["score"].iloc[3] < 80
+
+
+@pytest.mark.parametrize("threshold, status", [(70, "misspelled"), (95, "unknown")])
+def test_fuzzy_threshold_decides_misspelled_vs_unknown(threshold, status):
+    catalog = ServiceCatalog(SERVICES, fuzzy_threshold=threshold)
+    score = catalog.lookup("OUTLOK")[1]
+    assert 70 <= score < 95
+    assert catalog.validate(["OUTLOK - Cannot open"])["status"].iloc[0] == status
+
+
+def test_validate_matches_lookup_for_unknown_prefixes(catalog):
+    validation = catalog.validate(["PASWORD - Reset", "TEAMZ - no audio"])
+    for prefix, suggestion, score in zip(validation["prefix"], validation["suggestion"], validation["score"]):
+        assert (suggestion, pytest.approx(score)) == catalog.lookup(prefix)
+
+
+def test_flags_only_off_catalog_prefixes(catalog):
+    flags = catalog.flags(["OUTLOOK - Mailbox full", "OUTLOK - Cannot open", "SAP - Login fails", "no prefix here"])
+    assert flags[0] is None and flags[3] is None
+    assert flags[1] == ("Manual audit required",
+                        " |Q2- Service 'OUTLOK' is not in the service catalog, did you mean 'OUTLOOK'?")
+    assert flags[2] == ("Manual audit required", " |Q2- Service 'SAP' is not in the service catalog")
+
+
+def test_template_answers_win_over_catalog_flags(catalog):
+    export = synthetic_export(4, seed=1)
+    export['Subject'] = "OUTLOK - Cannot open"
+    template = pd.read_excel(audit_engine.DEFAULT_TEMPLATE_PATH)
+    template.loc[0, 'Request ID'] = export['RequestID'].iloc[0]
+    template.loc[0, audit_engine.Q2_COLUMN] = "Yes"
+
+    ctx = audit_engine.AuditContext(StubChat(latency_ms=0), StubEmbedder(), service_catalog=catalog)
+    report, stats = audit_engine.run_audit(ctx, export, template)
+    report = report.set_index('Request ID')
+
+    answered = report.loc[export['RequestID'].iloc[0]]
+    assert answered['Q-2'] == "Yes"
+    assert "service catalog" not in str(answered['Notes'])
+    flagged = report.loc[export['RequestID'].iloc[1]]
+    assert flagged['Q-2'] == "Manual audit required"
+    assert "did you mean 'OUTLOOK'" in flagged['Notes']
+    assert stats["services_flagged"] == 3
@@ -0,0 +1,210 @@
+import argparse
+import os
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+# Local classifier for Q-3, Q-5 and Q-6, trained on the verdicts of earlier audits. Each question gets
+# a logistic regression over the MiniLM embedding of the ticket's Resolution. At audit time a ticket
+# whose predicted verdict is at least as confident as the question's threshold is answered in
+# milliseconds on CPU and spares its LLM call like a rule verdict; everything else still goes to the
+# model. Retraining is one command over the audited reports and the exports they were made from:
+#
+#   python verdict_classifier.py --report doc/doc1/Result-1/Updated_Service_Desk_Incident_Management_Ticket_Audits.xlsx \
+#       --export doc/doc1/Result-1/Current_day_by_Technician.xlsx
+#
+# Thresholds are chosen from cross-validated predictions: the lowest confidence at which the classifier
+# still agrees with the recorded (LLM) verdicts at least CLASSIFIER_TARGET_AGREEMENT of the time. The
+# agreement and coverage at every threshold are printed and kept with the model.
+
+VERDICT_CLASSIFIER_PATH = os.getenv("VERDICT_CLASSIFIER_PATH", os.path.join(".cache", "verdict_classifier.joblib"))
+CLASSIFIER_TARGET_AGREEMENT = float(os.getenv("CLASSIFIER_TARGET_AGREEMENT", "0.95"))
+# Tickets a threshold must answer in cross-validation before its agreement is trusted
+CLASSIFIER_MIN_SUPPORT = int(os.getenv("CLASSIFIER_MIN_SUPPORT", "30"))
+CLASSIFIER_QUESTIONS = ["Q-3", "Q-5", "Q-6"]
+CONFIDENCE_THRESHOLDS = np.round(np.arange(0.5, 1.0, 0.01), 2)
+# Verdicts that carry no note when the LLM gives them either
+NOTE_FREE_VERDICTS = {"yes", "n/a - existing article"}
+
+
+def canonical_verdicts(verdicts):
+    # Verdicts differ in case between runs ("Manual Audit required" / "Manual audit required");
+    # every spelling is mapped to the most common one
+    verdicts = verdicts.astype(str).str.strip()
+    spellings = verdicts.groupby(verdicts.str.lower()).agg(lambda values: values.value_counts().index[0])
+    return verdicts.str.lower().map(spellings)
+
+
+def threshold_report(labels, probabilities, classes):
+    # Coverage (share of tickets the classifier would answer), how many that is and the agreement with
+    # the recorded verdict on those tickets, for every candidate confidence threshold
+    confidence = probabilities.max(axis=1)
+    predicted = classes[probabilities.argmax(axis=1)]
+    report = []
+    for threshold in CONFIDENCE_THRESHOLDS:
+        answered = confidence >= threshold
+        report.append({
+            "threshold": float(threshold),
+            "coverage": round(float(answered.mean()), 3),
+            "answered": int(answered.sum()),
+            "agreement": round(float((predicted[answered] == labels[answered]).mean()), 3) if answered.any() else None,
+        })
+    return report
+
+
+def choose_threshold(report, target_agreement, min_support=CLASSIFIER_MIN_SUPPORT):
+    for row in report:
+        if row["answered"] >= min_support and row["agreement"] >= target_agreement:
+            return row["threshold"]
+    return None
+
+
+def train_question(embeddings, labels, target_agreement, min_support=CLASSIFIER_MIN_SUPPORT):
+    # (entry for VerdictClassifier, message); entry is None when there is not enough to learn from
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import cross_val_predict
+
+    classes, counts = np.unique(labels, return_counts=True)
+    if len(classes) < 2:
+        return None, f"only one verdict ({classes[0] if len(classes) else 'none'}) in the training data"
+    if counts.min() < 2:
+        return None, f"too few examples of '{classes[counts.argmin()]}' to cross-validate ({counts.min()})"
+
+    model = LogisticRegression(max_iter=1000, class_weight="balanced")
+    probabilities = cross_val_predict(model, embeddings, labels, cv=min(5, int(counts.min())), method="predict_proba")
+    report = threshold_report(labels, probabilities, classes)
+    threshold = choose_threshold(report, target_agreement, min_support)
+    model.fit(embeddings, labels)
+    entry = {"model": model, "threshold": threshold, "classes": list(classes), "tickets": len(labels), "report": report}
+    if threshold is None:
+        return entry, (f"no confidence threshold reaches {target_agreement:.0%} agreement on at least {min_support} "
+                       f"tickets; the LLM answers every ticket")
+    chosen = next(row for row in report if row["threshold"] == threshold)
+    return entry, (f"threshold {threshold:.2f}: answers {chosen['coverage']:.0%} of tickets locally "
+                   f"with {chosen['agreement']:.1%} agreement")
+
+
+class VerdictClassifier:
+    def __init__(self, questions, embedding_model, trained_at=None):
+        self.questions = questions  # {"Q-3": {"model", "threshold", "classes", "tickets", "report"}, ...}
+        self.embedding_model = embedding_model
+        self.trained_at = trained_at
+
+    @classmethod
+    def load(cls, path):
+        import joblib
+
+        data = joblib.load(path)
+        return cls(data["questions"], data["embedding_model"], data.get("trained_at"))
+
+    def save(self, path):
+        import joblib
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        joblib.dump({"questions": self.questions, "embedding_model": self.embedding_model,
+                     "trained_at": self.trained_at}, path)
+
+    def predict(self, embeddings):
+        # {question label: [(verdict, note) or None per row]} with a verdict only where the prediction is
+        # at least as confident as that question's threshold
+        predictions = {}
+        for question, entry in self.questions.items():
+            if entry["threshold"] is None or not len(embeddings):
+                continue
+            probabilities = entry["model"].predict_proba(embeddings)
+            classes = entry["model"].classes_
+            results = []
+            for row in probabilities:
+                best = row.argmax()
+                if row[best] < entry["threshold"]:
+                    results.append(None)
+                    continue
+                verdict = str(classes[best])
+                note = None
+                if verdict.lower() not in NOTE_FREE_VERDICTS:
+                    note = f" |{question.replace('-', '')}- Classifier ({row[best]:.0%} confident): {verdict}"
+                results.append((verdict, note))
+            predictions[question] = results
+        return predictions
+
+
+def load_verdict_classifier(path=VERDICT_CLASSIFIER_PATH):
+    # None when no classifier has been trained, which leaves every ticket to the LLM
+    if not path or not os.path.exists(path):
+        return None
+    return VerdictClassifier.load(path)
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    import audit_engine
+    from export_reader import read_export
+
+    default_report = os.path.join('doc', 'doc1', 'Result-1', audit_engine.REPORT_FILE_NAME)
+    default_export = os.path.join('doc', 'doc1', 'Result-1', 'Current_day_by_Technician.xlsx')
+    parser = argparse.ArgumentParser(description="Train the local Q-3/Q-5/Q-6 classifier on audited reports.")
+    parser.add_argument("--report", action="append", help=f"audited report workbook (default: {default_report})")
+    parser.add_argument("--export", action="append", help=f"export the report was made from (default: {default_export})")
+    parser.add_argument("--target-agreement", type=float, default=CLASSIFIER_TARGET_AGREEMENT,
+                        help="agreement with the recorded verdicts a threshold must reach (default: %(default)s)")
+    parser.add_argument("--min-support", type=int, default=CLASSIFIER_MIN_SUPPORT,
+                        help="tickets a threshold must answer in cross-validation to be chosen (default: %(default)s)")
+    parser.add_argument("--output", default=VERDICT_CLASSIFIER_PATH, help="model file (default: %(default)s)")
+    args = parser.parse_args(argv)
+    args.report = args.report or [default_report]
+    args.export = args.export or [default_export]
+    if len(args.report) != len(args.export):
+        parser.error("give one --export per --report")
+
+    tickets = pd.concat([
+        audit_engine.audited_tickets(pd.read_excel(report), read_export(export))
+        for report, export in zip(args.report, args.export)
+    ], ignore_index=True)
+    tickets = tickets[tickets['Resolution'].notna() & (tickets['Resolution'].astype(str).str.strip() != '')]
+    if tickets.empty:
+        print("No audited tickets with a resolution found in the given workbooks", file=sys.stderr)
+        return 1
+
+    embedding_cache = audit_engine.open_embedding_cache() if audit_engine.EMBEDDING_CACHE_ENABLED else None
+    ctx = audit_engine.AuditContext(None, audit_engine.load_semantic_model(), embedding_cache=embedding_cache)
+    embeddings = audit_engine.encode_texts(ctx, tickets['Resolution'].astype(str).tolist()).cpu().numpy()
+
+    questions = {}
+    for question in CLASSIFIER_QUESTIONS:
+        if question not in tickets.columns:
+            print(f"{question}: not in the audited reports, skipped")
+            continue
+        known = (tickets[question].notna() & (tickets[question].astype(str).str.strip() != '')
+                 & (tickets[question] != audit_engine.LLM_ERROR_VERDICT)).to_numpy()
+        labels = canonical_verdicts(tickets.loc[known, question]).to_numpy()
+        entry, message = train_question(embeddings[known], labels, args.target_agreement, args.min_support)
+        print(f"{question}: {known.sum()} tickets, {message}")
+        if entry is None:
+            continue
+        questions[question] = entry
+        for row in entry["report"]:
+            if round(row["threshold"] * 100) % 10 and row["threshold"] != entry["threshold"]:
+                continue
+            agreement = "n/a" if row["agreement"] is None else f"{row['agreement']:.1%}"
+            chosen = "  <- chosen" if row["threshold"] == entry["threshold"] else ""
+            print(f"    confidence >= {row['threshold']:.2f}: answers {row['coverage']:.0%} ({row['answered']}), "
+                  f"agreement {agreement}{chosen}")
+
+    if not questions:
+        print("Nothing to train on; no classifier written", file=sys.stderr)
+        return 1
+    VerdictClassifier(
+        questions, audit_engine.SEMANTIC_MODEL_NAME, datetime.now(timezone.utc).isoformat(timespec="seconds")
+    ).save(args.output)
+    print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())